@@ -0,0 +1,116 @@
+# Асинхронные версии функций поиска из api.core для бота на asyncio (main_async.py).
+# Запросы к API выполняются через aiohttp, а кэш ответов, кэш маршрутов, справочник станций и
+# форматирование результатов - общие с синхронной версией. Кэши могут храниться в БД, поэтому обращения
+# к ним (и разбор ответов API) выполняются в пуле потоков, не блокируя цикл событий.
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, Tuple
+
+import aiohttp
+
+from api import core
+from api.cache import AsyncSingleFlight
+from api.client import api_client
+from config_data.config import API_CONNECT_TIMEOUT, API_READ_TIMEOUT, ASYNC_API_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+_session: aiohttp.ClientSession | None = None
+
+# одновременные одинаковые запросы к API (search/ и thread/) выполняются один раз
+in_flight = AsyncSingleFlight()
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """Общая для всех запросов сессия aiohttp с пулом keep-alive соединений"""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=ASYNC_API_POOL_SIZE),
+            timeout=aiohttp.ClientTimeout(sock_connect=API_CONNECT_TIMEOUT, sock_read=API_READ_TIMEOUT),
+            headers={"Accept-Encoding": "gzip, deflate"},
+        )
+    return _session
+
+
+async def close_session() -> None:
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
+async def api_get(url: str, params: Dict) -> Tuple[int, str] | None:
+    """GET-запрос к API
+
+    :return: (код ответа, текст ответа); None, если запрос не удался (таймаут, ошибка сети)
+    """
+    session = await get_session()
+    started = time.perf_counter()
+    try:
+        async with session.get(url, params=params) as response:
+            return response.status, await response.text()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+        logger.warning("Запрос к API %s завершился ошибкой: %s", url, error)
+        return None
+    finally:
+        api_client.record(url, time.perf_counter() - started)
+
+
+async def search_routes_between(
+    search_type: str,
+    from_station: str,
+    to_station: str,
+    transport_types: str,
+    date: str | None = None,
+) -> Dict | None:
+    """Асинхронная версия api.core.search_routes_between (те же параметры и результат)"""
+    url = f"{core.base_url}search/?"
+
+    prepared = core.prepare_search(search_type, from_station, to_station, transport_types, date)
+    if prepared is None:
+        return None
+    cache_key, params, ttl = prepared
+
+    search_data = await asyncio.to_thread(core.search_cache.get, cache_key)
+    if search_data is not None:
+        return search_data
+
+    def save(text: str) -> Dict:
+        search_data = json.loads(text)
+        core.search_cache.set(cache_key, search_data, ttl, text=text)
+        return search_data
+
+    async def request() -> Dict | None:
+        result = await api_get(url, params)
+        if result is None or result[0] != 200:
+            return None
+        return await asyncio.to_thread(save, result[1])
+
+    return await in_flight.do(cache_key, request)
+
+
+async def fetch_thread(thread_uid: str) -> Tuple[Dict, str] | None:
+    """Асинхронная версия api.core.fetch_thread"""
+    url = f"{core.base_url}thread/?"
+    result = await api_get(url, {"apikey": core.API_KEY, "uid": thread_uid})
+    if result is None or result[0] != 200:
+        return None
+
+    def save(text: str) -> Tuple[Dict, str]:
+        search_data = json.loads(text)
+        return search_data, core.cache_thread(thread_uid, search_data)
+
+    return await asyncio.to_thread(save, result[1])
+
+
+async def route_stations_text(thread_uid: str) -> str | None:
+    """Асинхронная версия api.core.route_stations_text"""
+    cached = await asyncio.to_thread(core.get_cached_thread, thread_uid)
+    if cached is not None:
+        return cached.text
+
+    fetched = await in_flight.do(f"thread:{thread_uid}", lambda: fetch_thread(thread_uid))
+    return fetched[1] if fetched else None
@@ -0,0 +1,220 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from database.database import ApiCache
+
+# как часто (раз в сколько записей) из БД удаляются устаревшие ответы
+PURGE_EVERY = 500
+
+
+class ResponseCache:
+    """LRU-кэш ответов API с временем жизни (TTL) для каждой записи.
+
+    Объем кэша в памяти ограничен суммарным размером ответов (по длине JSON), при переполнении
+    вытесняются давно не использованные записи. Если persistent=True, ответы дополнительно
+    сохраняются в таблицу ApiCache и переживают перезапуск бота.
+    """
+
+    def __init__(self, max_bytes: int, persistent: bool = False) -> None:
+        self.max_bytes = max_bytes
+        self.persistent = persistent
+
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Any | None:
+        """Возвращает сохраненный ответ (или None, если его нет или истек срок жизни)"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+                self._pop(key)
+
+        if self.persistent:
+            row = ApiCache.get_or_none((ApiCache.key == key) & (ApiCache.expires_at > now))
+            if row is not None:
+                value = json.loads(row.value)
+                self._remember(key, value, len(row.value), row.expires_at)
+                with self._lock:
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any, ttl: float, text: str | None = None) -> None:
+        """Сохраняет ответ на ttl секунд
+
+        :param text: исходный JSON ответа (если есть), чтобы не сериализовать ответ повторно
+        """
+        if text is None:
+            text = json.dumps(value, ensure_ascii=False)
+        expires_at = time.time() + ttl
+        self._remember(key, value, len(text), expires_at)
+
+        if self.persistent:
+            ApiCache.replace(key=key, value=text, expires_at=expires_at).execute()
+            with self._lock:
+                self._writes += 1
+                purge = self._writes % PURGE_EVERY == 0
+            if purge:
+                ApiCache.delete().where(ApiCache.expires_at <= time.time()).execute()
+
+    def _remember(self, key: str, value: Any, size: int, expires_at: float) -> None:
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+            self._entries[key] = (expires_at, size, value)
+            self._size += size
+
+            while self._size > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def _pop(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+        if self.persistent:
+            ApiCache.delete().execute()
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики попаданий/промахов и текущий объем кэша в памяти"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._size,
+            }
+
+
+class _Call:
+    """Выполняющийся запрос, результат которого ждут другие потоки"""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Объединение одновременных одинаковых запросов.
+
+    Если несколько потоков одновременно вызывают do() с одним и тем же ключом, функция выполняется
+    только в первом из них, а остальные дожидаются и получают тот же результат (или то же исключение).
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key: str, func: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+                leader = True
+            else:
+                self.shared += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+    def stats(self) -> Dict[str, int]:
+        """Сколько запросов было выполнено и сколько получили результат чужого запроса"""
+        with self._lock:
+            return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._calls)}
+
+
+class _AsyncCall:
+    """Выполняющийся запрос (задача asyncio) и число ожидающих его корутин"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncSingleFlight:
+    """Объединение одновременных одинаковых запросов для asyncio (аналог SingleFlight для корутин).
+
+    Запрос выполняется в отдельной задаче, поэтому отмена первого вызывающего не отменяет его для остальных:
+    задача отменяется, только когда ее результат больше никто не ждет.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[str, _AsyncCall] = {}
+
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = self._calls[key] = _AsyncCall(asyncio.ensure_future(func()))
+            call.task.add_done_callback(lambda task: self._forget(key, call))
+            self.calls += 1
+        else:
+            self.shared += 1
+
+        call.waiters += 1
+        try:
+            # shield: отмена одного из ожидающих не должна отменять общий запрос
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _forget(self, key: str, call: _AsyncCall) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._calls)}
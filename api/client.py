@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config_data.config import API_CONNECT_TIMEOUT, API_POOL_SIZE, API_READ_TIMEOUT
+
+# сколько последних замеров времени ответа хранится для каждого метода API
+LATENCY_SAMPLES = 1000
+
+
+class RaspClient:
+    """HTTP-клиент для API Яндекс Расписаний.
+
+    Все запросы идут через одну сессию requests с пулом keep-alive соединений, поэтому TCP- и
+    TLS-соединение не устанавливается заново для каждого поиска. У каждого запроса есть таймауты на
+    подключение и чтение, а время ответа запоминается отдельно для каждого метода API
+    (stations_list, search, thread).
+    """
+
+    def __init__(
+        self,
+        pool_size: int = API_POOL_SIZE,
+        connect_timeout: float = API_CONNECT_TIMEOUT,
+        read_timeout: float = API_READ_TIMEOUT,
+    ) -> None:
+        self.timeout = (connect_timeout, read_timeout)
+
+        self.session = requests.Session()
+        self.session.headers["Accept-Encoding"] = "gzip, deflate"
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Выполняет GET-запрос через пул соединений (параметры - как у requests.get).
+
+        Для потоковых запросов (stream=True) замеряется время до получения заголовков ответа.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+
+        started = time.perf_counter()
+        try:
+            return self.session.get(url, **kwargs)
+        finally:
+            self.record(url, time.perf_counter() - started)
+
+    def record(self, url: str, seconds: float) -> None:
+        """Запоминает время ответа на запрос к API (в том числе сделанный в обход клиента, например, из asyncio)"""
+        method = urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1]
+        with self._lock:
+            samples = self._latencies.get(method)
+            if samples is None:
+                samples = self._latencies[method] = deque(maxlen=LATENCY_SAMPLES)
+            samples.append(seconds)
+
+    def latency_stats(self) -> Dict[str, Dict[str, float]]:
+        """Статистика времени ответа API по последним запросам для каждого метода:
+        {метод: {"count": ..., "avg_ms": ..., "p50_ms": ..., "p95_ms": ..., "max_ms": ...}}
+        """
+        with self._lock:
+            snapshot = {method: sorted(samples) for method, samples in self._latencies.items()}
+
+        stats = {}
+        for method, samples in snapshot.items():
+            if not samples:
+                continue
+            stats[method] = {
+                "count": len(samples),
+                "avg_ms": sum(samples) / len(samples) * 1000,
+                "p50_ms": samples[len(samples) // 2] * 1000,
+                "p95_ms": samples[min(int(len(samples) * 0.95), len(samples) - 1)] * 1000,
+                "max_ms": samples[-1] * 1000,
+            }
+        return stats
+
+
+api_client = RaspClient()
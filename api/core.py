@@ -1,47 +1,447 @@
+import codecs
+import gzip
+import hashlib
 import json
+import logging
 import math
+import os
+import re
+import threading
+import time
+from array import array
 from datetime import datetime
-from typing import Dict
+from functools import lru_cache
+from sys import intern
+from typing import Dict, Iterable, Iterator, List, Tuple
 
 import requests
-from config_data.config import API_KEY
-from database.database import Station, db
+from peewee import chunked
+
+from api.cache import ResponseCache, SingleFlight
+from api.client import api_client
+from config_data.config import (
+    API_KEY,
+    RASP_BASE_URL,
+    ROUTE_STATIONS_CACHE_TTL,
+    ROUTES_CACHE_TTL,
+    SEARCH_CACHE_MAX_BYTES,
+    SEARCH_CACHE_PERSISTENT,
+    STATIONS_BATCH_SIZE,
+    STATIONS_MAX_DELETE_SHARE,
+    STATIONS_SNAPSHOT_PATH,
+    THREAD_CACHE_MAX_ROWS,
+    THREAD_CACHE_TTL,
+)
+from database.database import Setting, Station, ThreadCache, db
+from database.station_index import station_index
+from database.station_search import station_search
+
+base_url = RASP_BASE_URL
+
+logger = logging.getLogger(__name__)
+
+# кэш ответов search/ по (коду отправления, коду прибытия, виду транспорта, дате)
+search_cache = ResponseCache(SEARCH_CACHE_MAX_BYTES, persistent=SEARCH_CACHE_PERSISTENT)
+
+# как часто (раз в сколько сохраненных маршрутов) кэш маршрутов урезается до THREAD_CACHE_MAX_ROWS
+THREAD_CACHE_TRIM_EVERY = 100
+_thread_cache_writes = 0
+_thread_cache_lock = threading.Lock()
+
+# одновременные одинаковые запросы к API (search/ и thread/) выполняются один раз
+in_flight = SingleFlight()
+
+# ключи в таблице Setting для версии загруженного справочника станций
+STATIONS_DIGEST_KEY = "stations_digest"
+STATIONS_ETAG_KEY = "stations_etag"
+
+# заголовок файла-снимка справочника станций; версия меняется при изменении формата
+SNAPSHOT_HEADER = "rasp-stations-snapshot"
+SNAPSHOT_VERSION = 1
+
+# начало массива станций внутри населенного пункта: "stations": [
+_stations_array_re = re.compile(r'"stations"\s*:\s*\[')
+
+# символы, которые важны для вложенности JSON: экранирование (вместе со следующим символом), кавычки и скобки
+_json_structure_re = re.compile(r'\\.?|["{}\[\]]', re.DOTALL)
+
+
+class _JsonNesting:
+    """Глубина вложенности JSON-текста, который передается по частям (без разбора значений).
+    Нужна, чтобы отличить полный ответ от оборванного между населенными пунктами или регионами"""
+
+    def __init__(self) -> None:
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False  # часть текста закончилась на обратной косой черте внутри строки
+
+    def feed(self, text: str) -> None:
+        start = 0
+        if self.escaped and text:
+            self.escaped = False
+            start = 1
+
+        for match in _json_structure_re.finditer(text, start):
+            token = match.group()
+            if token[0] == "\\":
+                self.escaped = len(token) == 1
+            elif token == '"':
+                self.in_string = not self.in_string
+            elif self.in_string:
+                continue
+            elif token in "{[":
+                self.depth += 1
+                self.started = True
+            else:
+                self.depth -= 1
+
+    @property
+    def closed(self) -> bool:
+        return self.started and self.depth == 0 and not self.in_string
+
+
+def iter_station_objects(chunks: Iterable[str]) -> Iterator[Dict]:
+    """Потоково разбирает ответ stations_list и по одной возвращает станции (словари из массивов "stations").
+
+    Ответ API не загружается в память целиком: в буфере хранится только текущая необработанная часть текста.
+    Ключ "stations" в выдаче встречается только у населенных пунктов, поэтому достаточно находить начало
+    такого массива и декодировать его элементы по одному. Текст вне массивов станций проверяется на
+    вложенность скобок, чтобы ответ, оборванный между населенными пунктами, не считался полным.
+
+    :param chunks: части текста ответа в порядке получения
+    :raises ValueError: если ответ оборвался (посреди массива станций или до конца объекта верхнего уровня)
+    """
+    decoder = json.JSONDecoder()
+    chunks = iter(chunks)
+    nesting = _JsonNesting()
+    buffer = ""
+    pos = 0
+    in_array = False
+    exhausted = False
+
+    while True:
+        if not in_array:
+            match = _stations_array_re.search(buffer, pos)
+            if match:
+                nesting.feed(buffer[pos:match.start()])
+                pos = match.end()
+                in_array = True
+                continue
+            # оставляем хвост буфера на случай, если "stations" разрезан между частями ответа
+            cut = max(pos, len(buffer) - 32)
+            nesting.feed(buffer[pos:cut] if not exhausted else buffer[pos:])
+            buffer = buffer[cut:]
+            pos = 0
+        else:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+
+            if pos < len(buffer):
+                if buffer[pos] == "]":
+                    pos += 1
+                    in_array = False
+                    continue
+
+                try:
+                    station, pos = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # объект станции пришел не полностью - дочитываем ответ
+                    if exhausted:
+                        raise ValueError("Ответ stations_list оборвался посреди списка станций")
+                else:
+                    yield station
+                    continue
+
+            buffer = buffer[pos:]
+            pos = 0
+
+        if exhausted:
+            if in_array:
+                raise ValueError("Ответ stations_list оборвался посреди списка станций")
+            if not nesting.closed:
+                raise ValueError("Ответ stations_list оборвался до конца справочника")
+            return
+
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+        else:
+            buffer += chunk
+
+
+def iter_response_text(
+    response: requests.Response, chunk_size: int = 64 * 1024, digest=None
+) -> Iterator[str]:
+    """Декодирует тело потокового ответа API в текст по частям
+
+    :param digest: объект hashlib, который обновляется байтами ответа (если передан)
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        if digest is not None:
+            digest.update(chunk)
+        yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+
+def station_row(station: Dict) -> Dict | None:
+    """Извлекает из станции в выдаче API строку для таблицы Station (или None, если нет названия или кода)"""
+    title = station.get("title", "")
+    code = station.get("codes", {}).get("yandex_code", "")
+    transport_type = station.get("transport_type", "")
+
+    if title and code:
+        return {"title": title, "code": code, "transport_type": transport_type}
+    return None
+
+
+def save_stations_version(digest: str, etag: str | None) -> None:
+    """Запоминает хэш и ETag загруженного справочника станций"""
+    Setting.write(STATIONS_DIGEST_KEY, digest)
+    Setting.write(STATIONS_ETAG_KEY, etag or "")
+
+
+def station_directory() -> Dict[str, Tuple[str, str]]:
+    """Возвращает справочник станций из таблицы Station в виде {yandex_code: (название_станции, вид_транспорта)}"""
+    query = Station.select(Station.code, Station.title, Station.transport_type)
+    return {code: (title, transport_type) for code, title, transport_type in query.tuples().iterator()}
 
-base_url = "https://api.rasp.yandex-net.ru/v3.0/"
 
+def apply_stations_diff(
+    directory: Dict[str, Tuple[str, str]], max_delete_share: float | None = None
+) -> Dict[str, int] | None:
+    """Приводит таблицу Station к состоянию справочника, меняя только отличающиеся станции
 
-def load_stations() -> None:
+    :param directory: справочник станций вида {yandex_code: (название_станции, вид_транспорта)}
+    :param max_delete_share: максимальная доля станций таблицы, которую можно удалить (None - без ограничения)
+    :return: количество добавленных, измененных и удаленных станций;
+             None, если справочник удаляет больше max_delete_share станций (таблица не меняется)
     """
-    Загружает станции из API Яндекс Расписаний в БД, где создается таблица с полями:
-    "название_станции", "код_станции" и "вид_транспорта".
-    Очищает старую таблицу и заполняет заново.
+    existing = {}
+    duplicates = []
+    query = Station.select(Station.id, Station.code, Station.title, Station.transport_type)
+    for station_id, code, title, transport_type in query.tuples().iterator():
+        if code in existing:
+            duplicates.append(station_id)
+        else:
+            existing[code] = (station_id, title, transport_type)
+
+    inserted = [
+        {"title": title, "code": code, "transport_type": transport_type}
+        for code, (title, transport_type) in directory.items()
+        if code not in existing
+    ]
+    updated = [
+        (station_id, directory[code])
+        for code, (station_id, title, transport_type) in existing.items()
+        if code in directory and directory[code] != (title, transport_type)
+    ]
+    deleted = [
+        station_id
+        for code, (station_id, _, _) in existing.items()
+        if code not in directory
+    ]
+    if max_delete_share is not None and existing and len(deleted) > len(existing) * max_delete_share:
+        logger.warning(
+            "Обновление справочника станций удаляет %d из %d станций - не применяется",
+            len(deleted),
+            len(existing),
+        )
+        return None
+    deleted += duplicates
+
+    started = time.perf_counter()
+    with db.atomic():
+        for batch in chunked(inserted, STATIONS_BATCH_SIZE):
+            Station.insert_many(batch).execute()
+
+        for station_id, (title, transport_type) in updated:
+            Station.update(title=title, transport_type=transport_type).where(
+                Station.id == station_id
+            ).execute()
+
+        for batch in chunked(deleted, STATIONS_BATCH_SIZE):
+            Station.delete().where(Station.id.in_(batch)).execute()
+
+    if inserted or updated or deleted:
+        station_index.invalidate()
+        rows = len(inserted) + len(updated) + len(deleted)
+        elapsed = time.perf_counter() - started
+        logger.info(
+            "Записано станций в БД: %d за %.2f с (%.0f строк/с)", rows, elapsed, rows / max(elapsed, 1e-6)
+        )
+
+    return {"inserted": len(inserted), "updated": len(updated), "deleted": len(deleted)}
+
+
+def refresh_stations() -> Dict[str, int] | None:
+    """
+    Обновляет справочник станций в БД без полной перезагрузки.
+
+    Если справочник на стороне API не изменился (по ETag или по хэшу содержимого), таблица не трогается.
+    Иначе применяются только добавленные, измененные и удаленные станции (по yandex_code), поэтому
+    таблица не бывает пустой для параллельных запросов из обработчиков.
+
+    Ответ, оборванный до конца справочника, отбрасывается (ValueError), а обновление, удаляющее больше
+    STATIONS_MAX_DELETE_SHARE станций, не применяется.
+
+    :return: количество добавленных, измененных и удаленных станций; None, если запрос к API не удался
+             или обновление не применено
     """
-    # делаем соответствующий запрос к API Яндекс Расписаний
     url = f"{base_url}stations_list/?apikey={API_KEY}&lang=ru_RU&format=json"
+    unchanged = {"inserted": 0, "updated": 0, "deleted": 0}
+
+    has_stations = Station.select().exists()
+    headers = {}
+    etag = Setting.read(STATIONS_ETAG_KEY)
+    if etag and has_stations:
+        headers["If-None-Match"] = etag
+
+    started = time.perf_counter()
+    digest = hashlib.sha256()
+    directory = {}
+
+    with api_client.get(url, headers=headers, stream=True) as response:
+        if response.status_code == 304:
+            if not os.path.exists(STATIONS_SNAPSHOT_PATH):
+                save_stations_snapshot(station_directory(), Setting.read(STATIONS_DIGEST_KEY) or "")
+            logger.info("Справочник станций не изменился (ETag)")
+            return unchanged
+
+        if response.status_code != 200:
+            return None
+
+        for station in iter_station_objects(iter_response_text(response, digest=digest)):
+            row = station_row(station)
+            if row:
+                directory[row["code"]] = (row["title"], row["transport_type"])
+
+        etag = response.headers.get("ETag")
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        "Разобрано станций из API: %d за %.1f с (%.0f станций/с)",
+        len(directory),
+        elapsed,
+        len(directory) / max(elapsed, 1e-6),
+    )
 
-    response = requests.get(url)
-    if response.status_code == 200:
-        raw_data = json.loads(response.text)
-
-        with db.atomic():
-            Station.delete().execute()
-            # сайт возвращает в виде вложенных массивов со структурой
-            # countries -> regions -> settlements -> stations -> title, codes (-> yandex_code) и
-            # transport_type, поэтому извлекаем оттуда только title, yandex_code и transport_type
-            for country in raw_data.get("countries", []):
-                for region in country.get("regions", []):
-                    for settlement in region.get("settlements", []):
-                        for station in settlement.get("stations", []):
-                            title = station.get("title", "")
-                            code = station.get("codes", {}).get("yandex_code", "")
-                            transport_type = station.get("transport_type", "")
-
-                            if title and code:
-                                Station.create(
-                                    title=title,
-                                    code=code,
-                                    transport_type=transport_type,
-                                )
+    digest = digest.hexdigest()
+    if has_stations and digest == Setting.read(STATIONS_DIGEST_KEY):
+        save_stations_version(digest, etag)
+        if not os.path.exists(STATIONS_SNAPSHOT_PATH):
+            save_stations_snapshot(directory, digest)
+        logger.info("Справочник станций не изменился (хэш содержимого)")
+        return unchanged
+
+    changes = apply_stations_diff(directory, STATIONS_MAX_DELETE_SHARE)
+    if changes is None:
+        return None
+
+    save_stations_version(digest, etag)
+    save_stations_snapshot(directory, digest)
+
+    logger.info(
+        "Справочник станций обновлен за %.1f с: добавлено %d, изменено %d, удалено %d",
+        time.perf_counter() - started,
+        changes["inserted"],
+        changes["updated"],
+        changes["deleted"],
+    )
+    return changes
+
+
+def save_stations_snapshot(
+    directory: Dict[str, Tuple[str, str]], digest: str, path: str = STATIONS_SNAPSHOT_PATH
+) -> None:
+    """Сохраняет справочник станций в локальный сжатый файл-снимок, с которого бот может стартовать без API.
+
+    Формат (gzip, UTF-8): строка заголовка "<SNAPSHOT_HEADER> <версия> <хэш справочника>",
+    далее по строке на станцию "код<TAB>название<TAB>вид_транспорта". Файл заменяется атомарно.
+    """
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as file:
+        file.write(f"{SNAPSHOT_HEADER} {SNAPSHOT_VERSION} {digest}\n")
+        file.writelines(
+            "{}\t{}\t{}\n".format(code, _snapshot_field(title), _snapshot_field(transport_type))
+            for code, (title, transport_type) in directory.items()
+        )
+    os.replace(tmp_path, path)
+
+
+def _snapshot_field(value: str) -> str:
+    return value.replace("\t", " ").replace("\n", " ")
+
+
+def load_stations_snapshot(
+    path: str = STATIONS_SNAPSHOT_PATH,
+) -> Tuple[Dict[str, Tuple[str, str]], str] | None:
+    """Читает справочник станций из файла-снимка
+
+    :return: (справочник вида {yandex_code: (название_станции, вид_транспорта)}, хэш справочника);
+             None, если файла нет или он другой версии
+    """
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            header = file.readline().split()
+            if len(header) != 3 or header[0] != SNAPSHOT_HEADER or header[1] != str(SNAPSHOT_VERSION):
+                return None
+
+            directory = {}
+            for line in file:
+                code, title, transport_type = line.rstrip("\n").split("\t")
+                directory[code] = (title, transport_type)
+
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, ValueError):
+        logger.warning("Не удалось прочитать снимок справочника станций %s", path)
+        return None
+
+    return directory, header[2]
+
+
+def boot_stations() -> int:
+    """
+    Быстрый старт без обращения к API: если таблица Station пуста, заполняет ее из файла-снимка.
+
+    :return: количество станций, загруженных из снимка
+    """
+    if Station.select().exists():
+        return 0
+
+    snapshot = load_stations_snapshot()
+    if snapshot is None:
+        return 0
+
+    directory, digest = snapshot
+    changes = apply_stations_diff(directory)
+    save_stations_version(digest, None)
+    logger.info("Справочник станций загружен из снимка: %d станций", changes["inserted"])
+    return changes["inserted"]
+
+
+def refresh_stations_in_background() -> threading.Thread:
+    """Запускает в фоновом потоке построение индекса поиска станций по неточному названию и затем
+    обновление справочника станций из API (бот в это время уже отвечает, а похожие названия, пока индекс
+    не построен, ищутся в таблице Station)
+    """
+
+    def target():
+        try:
+            station_search.build()
+        except Exception:
+            logger.exception("Не удалось построить индекс поиска станций")
+
+        try:
+            refresh_stations()
+        except Exception:
+            logger.exception("Не удалось обновить справочник станций из API")
+
+    thread = threading.Thread(target=target, name="stations-refresh", daemon=True)
+    thread.start()
+    return thread
 
 
 def convert_time(string: str) -> str:
@@ -49,9 +449,10 @@ def convert_time(string: str) -> str:
     return datetime.fromisoformat(string).strftime("%H:%M")
 
 
+@lru_cache(maxsize=4096)
 def convert_duration(num: float) -> str:
     """Конвертирует длительность рейса/нахождения в пути/остановки из выдачи API Яндекс Расписаний
-    (из секунд в часы и/или минуты)
+    (из секунд в часы и/или минуты). Длительности в выдаче часто повторяются, поэтому результаты кэшируются
 
     :param num: длительность рейса/нахождения в пути/остановки в секундах
     :return: строка вида "{кол-во_часов} ч {кол-во_мин} мин" или "{кол-во_мин} мин"
@@ -68,10 +469,90 @@ def convert_duration(num: float) -> str:
         return f"{minutes} мин"
 
 
-def format_segments(segments: list) -> str:
+class SegmentTable:
+    """Рейсы из выдачи API search/ в виде столбцов, подготовленных для вывода.
+
+    Строится один раз на ответ API (normalize_segments): время отправления/прибытия разбирается один раз
+    и хранится как Unix-время (departures, arrivals) и готовая строка "🕐 ЧЧ:ММ – ЧЧ:ММ (длительность)" (times),
+    названия пунктов и перевозчиков интернируются, так как повторяются от рейса к рейсу. Поэтому вывод
+    страниц сводится к срезам и склейке строк, а сортировка и фильтрация - к перестановке индексов (take).
+    """
+
+    __slots__ = ("numbers", "routes", "carriers", "departures", "arrivals", "durations", "times")
+
+    def __init__(self) -> None:
+        self.numbers: List[str] = []  # номера рейсов
+        self.routes: List[str] = []  # "{пункт отправления} - {пункт прибытия}"
+        self.carriers: List[str] = []  # названия перевозчиков
+        self.departures = array("d")  # время отправления, Unix-время
+        self.arrivals = array("d")  # время прибытия, Unix-время
+        self.durations = array("d")  # длительность рейса, с
+        self.times: List[str] = []  # "🕐 {время отправления} – {время прибытия} ({длительность рейса})"
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def take(self, indices: Iterable[int]) -> "SegmentTable":
+        """Рейсы с указанными номерами (с 0) в указанном порядке, например отсортированные или отобранные:
+        table.take(sorted(range(len(table)), key=table.durations.__getitem__))
+        """
+        table = SegmentTable()
+        for index in indices:
+            table.numbers.append(self.numbers[index])
+            table.routes.append(self.routes[index])
+            table.carriers.append(self.carriers[index])
+            table.departures.append(self.departures[index])
+            table.arrivals.append(self.arrivals[index])
+            table.durations.append(self.durations[index])
+            table.times.append(self.times[index])
+        return table
+
+    def lines(self, start: int, end: int, offset: int = 0) -> List[str]:
+        """Тексты рейсов с start по end (не включая), номер по списку - offset + номер в таблице (с 1)"""
+        numbers, routes, times, carriers = self.numbers, self.routes, self.times, self.carriers
+        lines = []
+        for index in range(start, min(end, len(numbers))):
+            number = offset + index + 1
+            line = f"{number}. Рейс № {numbers[index]} {routes[index]}\n{times[index]}\nПеревозчик: {carriers[index]}\n"
+            # после каждого пятого рейса пустая строка не ставится
+            lines.append(line if number % 5 == 0 else line + "\n")
+        return lines
+
+
+# время суток в виде ЧАСЫ:МИНУТЫ по номеру минуты от начала суток (быстрее strftime)
+_clock = [f"{minute // 60:02d}:{minute % 60:02d}" for minute in range(24 * 60)]
+
+
+def normalize_segments(segments: list) -> SegmentTable:
+    """Преобразует список рейсов из выдачи API Яндекс Расписаний в SegmentTable за один проход"""
+    table = SegmentTable()
+    numbers, routes, carriers, times = table.numbers, table.routes, table.carriers, table.times
+    departures, arrivals, durations = table.departures, table.arrivals, table.durations
+
+    for segment in segments:
+        thread = segment["thread"]
+        departure = datetime.fromisoformat(segment["departure"])
+        arrival = datetime.fromisoformat(segment["arrival"])
+        duration = segment["duration"]
+
+        numbers.append(thread["number"])
+        routes.append(intern(f"{segment['from']['title']} - {segment['to']['title']}"))
+        carriers.append(intern(thread["carrier"]["title"]))
+        departures.append(departure.timestamp())
+        arrivals.append(arrival.timestamp())
+        durations.append(duration)
+        times.append(
+            f"🕐 {_clock[departure.hour * 60 + departure.minute]} – {_clock[arrival.hour * 60 + arrival.minute]} "
+            f"({convert_duration(duration)})"
+        )
+
+    return table
+
+
+def format_segments(segments: list | SegmentTable) -> str:
     """Функция для вывода результатов поиска, если найденных рейсов не более 5
 
-    :param segments: список рейсов из выдачи API Яндекс Расписаний
+    :param segments: список рейсов из выдачи API Яндекс Расписаний или SegmentTable
     :return: информация по рейсам в соответствии с шаблоном:
           "{№ по списку}. Рейс № {номер рейса} {пункт отправления} - {пункт прибытия}
            🕐 {время отправления} - {время прибытия} ({длительность рейса})
@@ -80,22 +561,30 @@ def format_segments(segments: list) -> str:
     if not segments:
         return "Рейсов не найдено 😔"
 
-    text = ""
-    for index, segment in enumerate(segments, 1):
-        text += f"{index}. Рейс № {segment['thread']['number']} {segment['from']['title']} - {segment['to']['title']}\n"
-        text += f"🕐 {convert_time(segment['departure'])} – {convert_time(segment['arrival'])} ({convert_duration(segment['duration'])})\n"
-        if index % 5 == 0:
-            text += f"Перевозчик: {segment['thread']['carrier']['title']}\n"
-        else:
-            text += f"Перевозчик: {segment['thread']['carrier']['title']}\n\n"
+    if not isinstance(segments, SegmentTable):
+        segments = normalize_segments(segments)
 
-    return text
+    return "".join(segments.lines(0, len(segments)))
+
+
+def thread_lines(threads: list, start: int, end: int, label: str) -> List[str]:
+    """Тексты маршрутов с start по end (не включая) с номерами по списку, начиная с start + 1
+
+    :param threads: список маршрутов (результат utils.utils.get_threads)
+    :param label: "Рейс" или "Маршрут"
+    """
+    lines = []
+    for number, thread in enumerate(threads[start:end], start + 1):
+        line = f"{number}. {label} № {thread.number} {thread.title}\nПеревозчик: {thread.carrier}\n"
+        # после каждого пятого маршрута пустая строка не ставится
+        lines.append(line if number % 5 == 0 else line + "\n")
+    return lines
 
 
 def format_threads(threads: list) -> str:
     """Функция для вывода результатов поиска, если найденных маршрутов не более 5
 
-    :param threads: список маршрутов из выдачи API Яндекс Расписаний
+    :param threads: список маршрутов (результат utils.utils.get_threads)
     :return: информация по маршрутам в соответствии с шаблоном:
           "{№ по списку}. Маршрут № {номер маршрута} {пункт отправления} - {пункт прибытия}
            Перевозчик: {название перевозчика}"
@@ -103,25 +592,15 @@ def format_threads(threads: list) -> str:
     if not threads:
         return "Рейсов не найдено 😔"
 
-    text = ""
-    for index, thread in enumerate(threads, 1):
-        for thread_number in thread.keys():
-            text += f"{index}. Рейс № {thread_number} {thread.get(thread_number)['title']}\n"
+    text = "".join(thread_lines(threads, 0, len(threads), "Рейс"))
+    return text + "\nВыберите маршрут и введите его порядковый номер из списка"
 
-        if index % 5 == 0:
-            text += f"Перевозчик: {thread.get(thread_number)['carrier']}\n"
-        else:
-            text += f"Перевозчик: {thread.get(thread_number)['carrier']}\n\n"
-
-    text += f"\nВыберите маршрут и введите его порядковый номер из списка"
-    return text
 
-
-def format_page(segments: list, page: int, on_page: int = 5) -> str:
+def format_page(segments: list | SegmentTable, page: int, on_page: int = 5) -> str:
     """Функция для вывода результатов поиска с помощью пагинации (когда найденных рейсов более 5)
 
     :params:
-        segments: список рейсов из выдачи API Яндекс Расписаний
+        segments: список рейсов из выдачи API Яндекс Расписаний или SegmentTable
         page: номер страницы в выдаче результата
         on_page: количество рейсов, выводимых на одной странице
 
@@ -135,29 +614,21 @@ def format_page(segments: list, page: int, on_page: int = 5) -> str:
 
     start = (page - 1) * on_page
     end = start + on_page
-    page_segments = segments[start:end]
-    total_pages = (
-        len(segments) // on_page + 1
-        if len(segments) % on_page != 0
-        else len(segments) // on_page
-    )
+    total_pages = (len(segments) + on_page - 1) // on_page
+    header = f"Рейсы {page}/{total_pages} (найдено {len(segments)}):\n\n"
 
-    text = f"Рейсы {page}/{total_pages} (найдено {len(segments)}):\n\n"
-    for index, segment in enumerate(page_segments, start + 1):
-        text += f"{index}. Рейс № {segment['thread']['number']} {segment['from']['title']} - {segment['to']['title']}\n"
-        text += f"🕐 {convert_time(segment['departure'])} – {convert_time(segment['arrival'])} ({convert_duration(segment['duration'])})\n"
-        if index % 5 == 0:
-            text += f"Перевозчик: {segment['thread']['carrier']['title']}\n"
-        else:
-            text += f"Перевозчик: {segment['thread']['carrier']['title']}\n\n"
-    return text
+    # из списка рейсов разбираем только рейсы этой страницы
+    if isinstance(segments, SegmentTable):
+        return header + "".join(segments.lines(start, end))
+
+    return header + "".join(normalize_segments(segments[start:end]).lines(0, on_page, offset=start))
 
 
 def format_page_threads(threads: list, page: int, on_page: int = 5) -> str:
     """Функция для вывода найденных маршрутов с помощью пагинации (когда маршрутов более 5)
 
     :params:
-        threads: список маршрутов
+        threads: список маршрутов (результат utils.utils.get_threads)
         page: номер страницы в выдаче результата
         on_page: количество маршрутов, выводимых на одной странице
 
@@ -169,25 +640,65 @@ def format_page_threads(threads: list, page: int, on_page: int = 5) -> str:
         return "Маршрутов не найдено 😔"
 
     start = (page - 1) * on_page
-    end = start + on_page
-    page_segments = threads[start:end]
-    total_pages = (
-        len(threads) // on_page + 1
-        if len(threads) % on_page != 0
-        else len(threads) // on_page
-    )
+    total_pages = (len(threads) + on_page - 1) // on_page
 
     text = f"Маршруты {page}/{total_pages} (найдено {len(threads)}):\n\n"
-    for index, thread in enumerate(page_segments, start + 1):
-        for thread_number in thread.keys():
-            text += f"{index}. Маршрут № {thread_number} {thread.get(thread_number)['title']}\n"
-            if index % 5 == 0:
-                text += f"Перевозчик: {thread.get(thread_number)['carrier']}\n"
-            else:
-                text += f"Перевозчик: {thread.get(thread_number)['carrier']}\n\n"
+    text += "".join(thread_lines(threads, start, start + on_page, "Маршрут"))
+    return text + "\nВыберите маршрут и введите его порядковый номер из списка"
 
-    text += f"\nВыберите маршрут и введите его порядковый номер из списка"
-    return text
+
+def format_pages(segments: list | SegmentTable, on_page: int = 5) -> List[str]:
+    """Готовые тексты всех страниц выдачи рейсов (результаты format_page для каждой страницы).
+    Сохраняются в данных диалога вместо ответа API, поэтому переключение страниц не требует форматирования
+    """
+    if not isinstance(segments, SegmentTable):
+        segments = normalize_segments(segments)
+
+    total_pages = max((len(segments) + on_page - 1) // on_page, 1)
+    return [format_page(segments, page, on_page) for page in range(1, total_pages + 1)]
+
+
+def format_pages_threads(threads: list, on_page: int = 5) -> List[str]:
+    """Готовые тексты всех страниц выдачи маршрутов (результаты format_page_threads для каждой страницы)"""
+    total_pages = max((len(threads) + on_page - 1) // on_page, 1)
+    return [format_page_threads(threads, page, on_page) for page in range(1, total_pages + 1)]
+
+
+def prepare_search(
+    search_type: str,
+    from_station: str,
+    to_station: str,
+    transport_types: str,
+    date: str | None = None,
+) -> Tuple[str, Dict, int] | None:
+    """
+    Готовит запрос к API search/ по названиям пунктов (общая часть синхронного и асинхронного поиска)
+
+    :return: (ключ для кэша ответов, параметры запроса, время жизни ответа в кэше);
+             None, если в справочнике для пункта отправления/прибытия нет кода с соответствующим видом транспорта
+    """
+    # извлекаем коды пункта отправления/прибытия из справочника в соответствии с видом транспорта
+    from_station_code = station_index.get_code(from_station, transport_types)
+    to_station_code = station_index.get_code(to_station, transport_types)
+
+    if not from_station_code or not to_station_code:
+        return None
+
+    params = {
+        "apikey": API_KEY,
+        "from": from_station_code,
+        "to": to_station_code,
+        "transport_types": transport_types,
+    }
+    if search_type == "routes_between":
+        params["date"] = date
+        ttl = ROUTES_CACHE_TTL
+    else:
+        date = None
+        ttl = ROUTE_STATIONS_CACHE_TTL
+
+    cache_key = f"search:{from_station_code}:{to_station_code}:{transport_types}:{date or ''}"
+    return cache_key, params, ttl
 
 
 def search_routes_between(
@@ -209,55 +720,84 @@ def search_routes_between(
             search_data: если код ответа при запросе к API == 200
             None: 1) если в справочнике нет для пункта отправления/прибытия нет кода с соответствующим
                     видом транспорта
-                  2) если код ответа != 200
+                  2) если код ответа != 200 или запрос не удался (таймаут, ошибка сети)
     """
-    global base_url
     url = f"{base_url}search/?"
 
-    # извлекаем коды пункта отправления/прибытия из справочника в соответствии с видом транспорта
-    from_stations = Station.select().where(
-        (Station.title == from_station) & (Station.transport_type == transport_types)
-    )
-    from_station_code = from_stations.first().code if from_stations.exists() else None
-
-    to_stations = Station.select().where(
-        (Station.title == to_station) & (Station.transport_type == transport_types)
-    )
-    to_station_code = to_stations.first().code if to_stations.exists() else None
-
-    if not from_station_code or not to_station_code:
+    prepared = prepare_search(search_type, from_station, to_station, transport_types, date)
+    if prepared is None:
         return None
+    cache_key, params, ttl = prepared
+
+    # популярные направления запрашивают многие пользователи, поэтому сначала проверяем кэш
+    search_data = search_cache.get(cache_key)
+    if search_data is not None:
+        return search_data
 
     # делаем запрос к API, если коды пункта отправления/прибытия были найдены
-    params = {
-        "apikey": API_KEY,
-        "from": from_station_code,
-        "to": to_station_code,
-        "transport_types": transport_types,
-    }
-    if search_type == "routes_between":
-        params["date"] = date
+    def request() -> Dict | None:
+        try:
+            response = api_client.get(url, params=params)
+        except requests.RequestException as error:
+            logger.warning("Запрос к API %s завершился ошибкой: %s", url, error)
+            return None
+
+        if response.status_code == 200:
+            search_data = json.loads(response.text)
+            search_cache.set(cache_key, search_data, ttl, text=response.text)
+            return search_data
 
-    response = requests.get(url=url, params=params)
+        else:
+            return None
 
-    if response.status_code == 200:
-        search_data = json.loads(response.text)
-        return search_data
+    # одновременные одинаковые поиски разных пользователей ждут один общий запрос к API
+    return in_flight.do(cache_key, request)
 
-    else:
-        return None
+
+def get_cached_thread(thread_uid: str) -> ThreadCache | None:
+    """Возвращает сохраненные станции следования маршрута, если они не старше THREAD_CACHE_TTL"""
+    return ThreadCache.get_or_none(
+        (ThreadCache.uid == thread_uid) & (ThreadCache.fetched_at > time.time() - THREAD_CACHE_TTL)
+    )
 
 
-def search_route_stations(thread_uid: str) -> Dict | None:
+def cache_thread(thread_uid: str, search_data: Dict) -> str:
+    """Сохраняет станции следования маршрута вместе с готовым текстом ответа
+
+    :return: текст со станциями следования (результат show_route_stations)
     """
-    Функция для получения от API станций следования по маршруту
+    global _thread_cache_writes
+
+    stops = [
+        [stop["station"]["title"], stop["stop_time"], stop["duration"]]
+        for stop in search_data["stops"]
+    ]
+    text = show_route_stations(search_data)
+    ThreadCache.replace(
+        uid=thread_uid,
+        stops=json.dumps(stops, ensure_ascii=False),
+        text=text,
+        fetched_at=time.time(),
+    ).execute()
+
+    # вытесняем давно полученные маршруты, чтобы таблица не росла бесконечно
+    with _thread_cache_lock:
+        _thread_cache_writes += 1
+        trim = _thread_cache_writes % THREAD_CACHE_TRIM_EVERY == 0
+    if trim:
+        newest = ThreadCache.select(ThreadCache.uid).order_by(ThreadCache.fetched_at.desc()).limit(
+            THREAD_CACHE_MAX_ROWS
+        )
+        ThreadCache.delete().where(ThreadCache.uid.not_in(newest)).execute()
 
-    :param thread_uid: идентификатор маршрута
-    returns:
-            search_data: если код ответа при запросе к API == 200
-            None: если код ответа != 200
+    return text
+
+
+def fetch_thread(thread_uid: str) -> Tuple[Dict, str] | None:
+    """Запрашивает у API станции следования по маршруту и сохраняет их в кэш маршрутов
+
+    :return: (данные по маршруту от API, текст со станциями следования); None, если запрос не удался
     """
-    global base_url
     url = f"{base_url}thread/?"
 
     params = {
@@ -265,16 +805,34 @@ def search_route_stations(thread_uid: str) -> Dict | None:
         "uid": thread_uid,
     }
 
-    response = requests.get(url=url, params=params)
+    try:
+        response = api_client.get(url, params=params)
+    except requests.RequestException as error:
+        logger.warning("Запрос к API %s завершился ошибкой: %s", url, error)
+        return None
 
     if response.status_code == 200:
         search_data = json.loads(response.text)
-        return search_data
+        return search_data, cache_thread(thread_uid, search_data)
 
     else:
         return None
 
 
+def route_stations_text(thread_uid: str) -> str | None:
+    """Возвращает текст со станциями следования по маршруту (из кэша маршрутов или по запросу к API)
+
+    :param thread_uid: идентификатор маршрута
+    :return: результат show_route_stations или None, если запрос к API не удался
+    """
+    cached = get_cached_thread(thread_uid)
+    if cached is not None:
+        return cached.text
+
+    fetched = in_flight.do(f"thread:{thread_uid}", lambda: fetch_thread(thread_uid))
+    return fetched[1] if fetched else None
+
+
 def show_route_stations(search_data: Dict) -> str:
     """Функция для вывода станций следования по маршруту
 
@@ -0,0 +1,11 @@
+from telebot.async_telebot import AsyncTeleBot
+
+from config_data import config
+from states.storage import AsyncSQLiteStateStorage
+
+storage = AsyncSQLiteStateStorage(
+    ttl=config.STATE_TTL,
+    cache_size=config.STATE_CACHE_SIZE,
+    max_bytes=config.STATE_MAX_BYTES,
+)
+bot = AsyncTeleBot(token=config.BOT_TOKEN, state_storage=storage)
@@ -0,0 +1,138 @@
+"""Нагрузочный тест записи в SQLite из нескольких потоков.
+
+Потоки-"обработчики" (как потоки UpdateDispatcher) записывают строки Search, каждый в своем соединении,
+а отдельный поток имитирует загрузку справочника станций: пачки строк Station с паузами на скачивание
+ответа API. Тест выполняется для профиля SQLite по умолчанию и для профиля из настроек (database.pragmas)
+на временной БД и выводит пропускную способность записи, задержки и число ошибок "database is locked".
+
+Запуск из корня проекта:
+    python -m benchmarks.db_writers --writers 8 --seconds 5
+    python -m benchmarks.db_writers --single-transaction  # загрузка станций одной транзакцией, как раньше
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+from peewee import OperationalError, chunked
+
+from config_data.config import DB_BUSY_TIMEOUT
+from database.database import Search, Station, User, db, pragmas
+
+
+def reload_stations(stop: threading.Event, batch_size: int, pause: float, single_transaction: bool) -> int:
+    """Имитирует запись справочника станций пачками, между которыми ответ API "скачивается" pause секунд"""
+    batches = 0
+
+    def batches_until_stop():
+        nonlocal batches
+        rows = ({"title": f"Станция {i}", "code": f"s{i}", "transport_type": "train"} for i in range(10 ** 9))
+        for batch in chunked(rows, batch_size):
+            if stop.is_set():
+                return
+            time.sleep(pause)
+            batches += 1
+            yield batch
+
+    with db.connection_context():
+        if single_transaction:
+            with db.atomic():
+                for batch in batches_until_stop():
+                    Station.insert_many(batch).execute()
+        else:
+            for batch in batches_until_stop():
+                with db.atomic():
+                    Station.insert_many(batch).execute()
+    return batches
+
+
+def write_searches(stop: threading.Event, user_id: int, latencies: List[float], errors: List[int]) -> None:
+    with db.connection_context():
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                Search.insert(
+                    user=user_id,
+                    search_type="routes_between",
+                    departure_station="Ст 1",
+                    arrival_station="Ст 2",
+                    date="2026-05-01",
+                    transport="поезд",
+                ).execute()
+            except OperationalError:
+                errors[0] += 1
+            else:
+                latencies.append(time.perf_counter() - started)
+
+
+def run(profile: Dict, args: argparse.Namespace) -> Dict:
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    db.init(path, pragmas=profile, timeout=args.busy_timeout)
+    with db.connection_context():
+        db.create_tables([User, Station, Search])
+        User.insert_many([{"id": i} for i in range(args.writers)]).execute()
+
+    stop = threading.Event()
+    latencies = [[] for _ in range(args.writers)]
+    errors = [[0] for _ in range(args.writers)]
+    threads = [
+        threading.Thread(target=write_searches, args=(stop, i, latencies[i], errors[i]))
+        for i in range(args.writers)
+    ]
+    reloaded = []
+    if not args.no_reload:
+        threads.append(
+            threading.Thread(
+                target=lambda: reloaded.append(
+                    reload_stations(stop, args.batch_size, args.pause, args.single_transaction)
+                )
+            )
+        )
+
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    samples = sorted(latency for thread_latencies in latencies for latency in thread_latencies)
+    db.close()
+
+    def percentile(p: float) -> float:
+        return samples[min(int(len(samples) * p), len(samples) - 1)] * 1000 if samples else 0.0
+
+    return {
+        "writes": len(samples),
+        "writes_per_s": round(len(samples) / args.seconds, 1),
+        "p50_ms": round(percentile(0.5), 2),
+        "p99_ms": round(percentile(0.99), 2),
+        "max_ms": round(samples[-1] * 1000, 2) if samples else 0.0,
+        "locked_errors": sum(error[0] for error in errors),
+        "station_batches": reloaded[0] if reloaded else 0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=8, help="число пишущих потоков")
+    parser.add_argument("--seconds", type=float, default=5, help="длительность теста для каждого профиля")
+    parser.add_argument("--batch-size", type=int, default=500, help="строк в пачке станций")
+    parser.add_argument("--pause", type=float, default=0.05, help="пауза между пачками станций (скачивание)")
+    parser.add_argument("--busy-timeout", type=float, default=DB_BUSY_TIMEOUT, help="ожидание блокировки, с")
+    parser.add_argument("--single-transaction", action="store_true", help="загружать станции одной транзакцией")
+    parser.add_argument("--no-reload", action="store_true", help="без параллельной загрузки станций")
+    args = parser.parse_args()
+
+    results = {
+        "default": run({}, args),
+        "configured": run(pragmas, args),
+    }
+    print(json.dumps({"profile": pragmas, "results": results}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
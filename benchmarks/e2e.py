@@ -0,0 +1,320 @@
+"""Сквозной нагрузочный тест бота: синтетические диалоги пользователей через bot.process_new_updates.
+
+Тест поднимает локальную замену API Яндекс Расписаний (benchmarks/fake_rasp.py), создает временную БД
+и передает боту обновления Telegram (сообщения и нажатия кнопок) так, как их передает polling: через
+bot.process_new_updates и потоки UpdateDispatcher. Запросы к Telegram подменяются заглушкой.
+
+Каждый пользователь проходит диалоги /routes_between (с листанием страниц), /route_stations (с листанием
+и выбором маршрута) и /history. Одновременно действуют --clients пользователей: каждый отправляет
+следующее обновление после того, как бот обработал предыдущее. В результате (JSON) - пропускная
+способность, перцентили времени обработки обновлений и каждого обработчика, память процесса (RSS)
+и число запросов к API. С --sender сообщения отправляются через очередь RateLimitedSender с ограничениями
+частоты из настроек (SEND_*), и время обработки обновления включает ожидание отправки ответов.
+
+Запуск из корня проекта (нужен файл .env, BOT_TOKEN может быть любым):
+    python -m benchmarks.e2e --users 500 --clients 50 --latency 0.05 --output e2e.json
+    python -m benchmarks.e2e --users 100 --clients 20 --sender
+"""
+import argparse
+import functools
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Dict, Iterator, List, Tuple
+
+from benchmarks.fake_rasp import FakeRaspAPI, start_server
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Перцентили выборки (в секундах) в миллисекундах"""
+    if not samples:
+        return {"count": 0}
+    samples = sorted(samples)
+
+    def at(p: float) -> float:
+        return round(samples[min(int(len(samples) * p), len(samples) - 1)] * 1000, 3)
+
+    return {
+        "count": len(samples),
+        "p50_ms": at(0.5),
+        "p95_ms": at(0.95),
+        "p99_ms": at(0.99),
+        "max_ms": round(samples[-1] * 1000, 3),
+    }
+
+
+def rss_mb() -> Dict[str, float]:
+    """Текущий и максимальный объем памяти процесса (RSS) в МБ"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    current = None
+    try:
+        with open("/proc/self/statm") as statm:
+            current = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        pass
+    return {"current": round(current, 1) if current is not None else None, "peak": round(peak, 1)}
+
+
+class FakeTelegram:
+    """Заглушка Bot API: отвечает на запросы бота без сети и запоминает клавиатуры пагинации в каждом чате"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._message_id = 0
+        self.requests: Dict[str, int] = defaultdict(int)
+        self.pagination: Dict[int, str] = {}  # {чат: callback_data кнопки следующей страницы}
+
+    def __call__(self, method, url, params=None, **kwargs):
+        name = url.rsplit("/", 1)[1]
+        params = params or {}
+        with self._lock:
+            self.requests[name] += 1
+            self._message_id += 1
+            message_id = self._message_id
+
+        chat_id = int(params.get("chat_id") or 0)
+        markup = params.get("reply_markup")
+        if markup and "page_" in markup:
+            self.pagination[chat_id] = json.loads(markup)["inline_keyboard"][0][-1]["callback_data"]
+
+        result = True
+        if name in ("sendMessage", "editMessageText"):
+            result = {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": params.get("text", ""),
+            }
+        return FakeResponse({"ok": True, "result": result})
+
+
+class FakeResponse:
+    status_code = 200
+    reason = "OK"
+
+    def __init__(self, payload: Dict) -> None:
+        self.text = json.dumps(payload)
+
+    def json(self) -> Dict:
+        return json.loads(self.text)
+
+
+class Updates:
+    """Конструктор обновлений Telegram от имени пользователей"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._update_id = 0
+
+    def _next_id(self) -> int:
+        with self._lock:
+            self._update_id += 1
+            return self._update_id
+
+    def message(self, user_id: int, text: str):
+        from telebot.types import Update
+
+        update_id = self._next_id()
+        message = {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"},
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+        return Update.de_json({"update_id": update_id, "message": message})
+
+    def callback(self, user_id: int, data: str):
+        from telebot.types import Update
+
+        update_id = self._next_id()
+        user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+        callback_query = {
+            "id": str(update_id),
+            "chat_instance": str(user_id),
+            "data": data,
+            "from": user,
+            "message": {"message_id": 1, "date": 0, "chat": {"id": user_id, "type": "private"}, "text": ""},
+        }
+        return Update.de_json({"update_id": update_id, "callback_query": callback_query})
+
+
+def dialog(user_id: int, departure: str, arrival: str, transport: str, telegram: FakeTelegram) -> Iterator[Tuple]:
+    """Шаги диалогов пользователя: ("message", текст) или ("callback", данные)"""
+    yield "message", "/routes_between"
+    yield "message", departure
+    yield "message", arrival
+    yield "message", "01.05.2026"
+    yield "callback", transport
+    for _ in range(2):
+        if user_id in telegram.pagination:
+            yield "callback", telegram.pagination.pop(user_id)
+
+    yield "message", "/route_stations"
+    yield "message", departure
+    yield "message", arrival
+    yield "callback", transport
+    if user_id in telegram.pagination:
+        yield "callback", telegram.pagination.pop(user_id)
+    yield "message", "1"
+
+    yield "message", "/history"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200, help="число пользователей (каждый проходит все диалоги)")
+    parser.add_argument("--clients", type=int, default=50, help="сколько пользователей действуют одновременно")
+    parser.add_argument("--stations", type=int, default=5000, help="синтетических станций в справочнике")
+    parser.add_argument("--segments", type=int, default=40, help="рейсов в ответе search/")
+    parser.add_argument("--stops", type=int, default=20, help="остановок в ответе thread/")
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка ответа API, с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов API с ошибкой 500")
+    parser.add_argument("--routes", type=int, default=50, help="число разных пар станций в диалогах")
+    parser.add_argument("--sender", action="store_true", help="отправлять сообщения через очередь с ограничением частоты")
+    parser.add_argument("--output", help="файл для результата в JSON (по умолчанию - только вывод на экран)")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+
+    api = FakeRaspAPI(
+        stations=args.stations,
+        segments=args.segments,
+        stops=args.stops,
+        latency=args.latency,
+        error_rate=args.error_rate,
+    )
+    _, base_url = start_server(api)
+
+    # бот работает с временной БД и локальной заменой API (настройки читаются при импорте модулей бота)
+    os.environ["RASP_BASE_URL"] = base_url
+    os.chdir(tempfile.mkdtemp(prefix="bot-e2e-"))
+
+    from telebot import apihelper
+    from telebot.custom_filters import StateFilter
+
+    from api.core import refresh_stations
+    from database.database import create_tables
+    from database.history_writer import history_writer
+    from database.station_search import station_search
+    from loader import bot, sender
+    import handlers  # noqa
+
+    telegram = FakeTelegram()
+    apihelper.CUSTOM_REQUEST_SENDER = telegram
+
+    create_tables()
+    refresh_stations()
+    station_search.build()
+    bot.add_custom_filter(StateFilter(bot))
+
+    # замеряем время каждого обработчика
+    handler_times: Dict[str, List[float]] = defaultdict(list)
+
+    def timed(function):
+        @functools.wraps(function)
+        def wrapper(*handler_args, **handler_kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*handler_args, **handler_kwargs)
+            finally:
+                handler_times[function.__name__].append(time.perf_counter() - started)
+
+        return wrapper
+
+    for handler in bot.message_handlers + bot.callback_query_handlers:
+        handler["function"] = timed(handler["function"])
+
+    # ...и полное время обработки каждого обновления (от передачи боту до завершения обработки)
+    done: Dict[int, threading.Event] = {}
+    update_times: List[float] = []
+    handle = bot.dispatcher.handle
+
+    def handle_and_notify(update) -> None:
+        try:
+            handle(update)
+        finally:
+            done[update.update_id].set()
+
+    bot.dispatcher.handle = handle_and_notify
+
+    # с очередью отправки ответ пользователю считается полученным, когда отправлены все сообщения обработчика
+    sent: Dict[int, List[Future]] = defaultdict(list)
+    submit = sender.submit
+
+    def submit_and_track(priority: int, method: str, chat_id, **kwargs) -> Future:
+        future = submit(priority, method, chat_id, **kwargs)
+        sent[chat_id].append(future)
+        return future
+
+    sender.submit = submit_and_track
+
+    pairs = api.station_pairs("suburban")
+    routes = [(pairs[index][0], pairs[-1 - index][0]) for index in range(min(args.routes, len(pairs) // 2))]
+    updates = Updates()
+
+    def client(user_ids: List[int]) -> None:
+        for user_id in user_ids:
+            departure, arrival = routes[user_id % len(routes)]
+            for kind, payload in dialog(user_id, departure, arrival, "suburban", telegram):
+                update = updates.message(user_id, payload) if kind == "message" else updates.callback(user_id, payload)
+                event = done[update.update_id] = threading.Event()
+                started = time.perf_counter()
+                bot.process_new_updates([update])
+                event.wait()
+                for future in sent.pop(user_id, []):
+                    future.exception()
+                update_times.append(time.perf_counter() - started)
+                del done[update.update_id]
+
+    users = list(range(1, args.users + 1))
+    clients = [
+        threading.Thread(target=client, args=(users[index :: args.clients],)) for index in range(args.clients)
+    ]
+
+    rss_before = rss_mb()
+    history_writer.start()
+    if args.sender:
+        sender.start()
+    bot.dispatcher.start()
+    started = time.perf_counter()
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    bot.dispatcher.stop()
+    sender.stop()
+    history_writer.stop()
+
+    result = {
+        "config": vars(args),
+        "duration_s": round(elapsed, 3),
+        "updates": len(update_times),
+        "throughput_updates_per_s": round(len(update_times) / elapsed, 1),
+        "throughput_users_per_s": round(args.users / elapsed, 2),
+        "update_latency": percentiles(update_times),
+        "handlers": {name: percentiles(samples) for name, samples in sorted(handler_times.items())},
+        "dispatcher": bot.dispatcher.metrics(),
+        "sender": sender.metrics(),
+        "rss_mb": {"before": rss_before, "after": rss_mb()},
+        "api_requests": api.requests,
+        "telegram_requests": dict(telegram.requests),
+    }
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    print(text)
+    if output:
+        with open(output, "w", encoding="utf-8") as file:
+            file.write(text)
+
+
+if __name__ == "__main__":
+    main()
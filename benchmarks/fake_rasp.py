@@ -0,0 +1,292 @@
+"""Локальная замена API Яндекс Расписаний для нагрузочных тестов без сети и API_KEY.
+
+Отвечает на запросы stations_list/, search/ и thread/ в формате API v3.0. Ответы строятся из файлов
+в benchmarks/fixtures (ответы API для пригородных поездов Москва (Белорусский вокзал) - Одинцово)
+и масштабируются: справочник дополняется N синтетическими станциями, а число рейсов в ответе search/
+и остановок в ответе thread/ задается параметрами. Можно задать задержку ответа и долю ответов с ошибкой 500.
+
+Бот или тест направляется на сервер через RASP_BASE_URL (в .env) или api.core.base_url:
+
+    python -m benchmarks.fake_rasp --port 8765 --stations 30000 --segments 50 --latency 0.05
+    RASP_BASE_URL=http://127.0.0.1:8765/v3.0/ python main.py
+
+Из тестов сервер запускается в фоновом потоке через start_server().
+"""
+import argparse
+import copy
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+API_PREFIX = "/v3.0/"
+
+# виды транспорта синтетических станций (по очереди)
+TRANSPORT_TYPES = ("train", "suburban", "bus", "plane")
+
+
+def load_fixture(name: str) -> Dict:
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as file:
+        return json.load(file)
+
+
+class FakeRaspAPI:
+    """Данные и поведение поддельного API.
+
+    :param stations: сколько синтетических станций добавить к справочнику из stations_list.json
+    :param segments: сколько рейсов возвращать в search/ (0 - как в search.json)
+    :param stops: сколько остановок возвращать в thread/ (0 - как в thread.json)
+    :param latency: задержка каждого ответа в секундах (к ней добавляется случайная до jitter секунд)
+    :param error_rate: доля ответов с ошибкой 500 (от 0 до 1)
+    """
+
+    def __init__(
+        self,
+        stations: int = 0,
+        segments: int = 0,
+        stops: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        self.segments = segments
+        self.stops = stops
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests: Dict[str, int] = {}
+
+        self.directory = load_fixture("stations_list.json")
+        if stations:
+            self.directory["countries"][0]["regions"].append(synthetic_region(stations))
+
+        self.stations_body = json.dumps(self.directory, ensure_ascii=False).encode()
+        self.stations_etag = '"%s"' % hashlib.sha256(self.stations_body).hexdigest()[:32]
+
+        # {yandex_code: объект станции в формате ответов search/ и thread/}
+        self.station_objects = {}
+        for station in iter_stations(self.directory):
+            code = station["codes"]["yandex_code"]
+            self.station_objects.setdefault(code, station_object(station))
+
+        self.search_template = load_fixture("search.json")
+        self.thread_template = load_fixture("thread.json")
+
+    def station_pairs(self, transport_type: str) -> List[Tuple[str, str]]:
+        """Названия станций справочника с видом транспорта transport_type (для генерации диалогов в тестах)"""
+        return [
+            (station["title"], station["codes"]["yandex_code"])
+            for station in iter_stations(self.directory)
+            if station["transport_type"] == transport_type
+        ]
+
+    def handle(self, path: str, query: Dict[str, str]) -> Tuple[int, bytes, Dict[str, str]]:
+        """Ответ на запрос: (код ответа, тело, дополнительные заголовки)"""
+        method = path[len(API_PREFIX) :].strip("/") if path.startswith(API_PREFIX) else ""
+        with self._lock:
+            self.requests[method] = self.requests.get(method, 0) + 1
+            failed = self._random.random() < self.error_rate
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+
+        if delay:
+            time.sleep(delay)
+        if failed:
+            return 500, error_body("Internal Server Error", 500), {}
+
+        if method == "stations_list":
+            return 200, self.stations_body, {"ETag": self.stations_etag}
+
+        if method == "search":
+            from_code, to_code = query.get("from", ""), query.get("to", "")
+            for code in (from_code, to_code):
+                if code not in self.station_objects:
+                    return 404, error_body(f"Не нашли объект по yandex коду {code}", 404), {}
+            body = self.search_body(from_code, to_code, query.get("date") or "", self.segments)
+            return 200, body, {}
+
+        if method == "thread":
+            uid = query.get("uid", "")
+            if not uid:
+                return 400, error_body("uid: обязательный параметр", 400), {}
+            return 200, self.thread_body(uid, self.stops), {}
+
+        return 404, error_body("Неизвестный метод API", 404), {}
+
+    @lru_cache(maxsize=4096)
+    def search_body(self, from_code: str, to_code: str, date: str, count: int) -> bytes:
+        """Ответ search/: рейсы из search.json, размноженные до count и равномерно распределенные по суткам"""
+        template = self.search_template["segments"]
+        count = count or len(template)
+        day = datetime.fromisoformat(date) if date else datetime(2026, 5, 1)
+        from_station, to_station = self.station_objects[from_code], self.station_objects[to_code]
+
+        segments = []
+        for index in range(count):
+            segment = copy.deepcopy(template[index % len(template)])
+            departure = day + timedelta(minutes=5 * 60 + index * (19 * 60) // count)
+            arrival = departure + timedelta(seconds=segment["duration"])
+            number = segment["thread"]["number"] + ("" if index < len(template) else f"-{index}")
+
+            segment["from"], segment["to"] = from_station, to_station
+            segment["departure"] = departure.isoformat() + "+03:00"
+            segment["arrival"] = arrival.isoformat() + "+03:00"
+            segment["start_date"] = departure.date().isoformat()
+            segment["thread"]["number"] = number
+            segment["thread"]["uid"] = f"{number}_{from_code}_{to_code}_g26_4"
+            segment["thread"]["title"] = f'{from_station["title"]} — {to_station["title"]}'
+            segments.append(segment)
+
+        response = dict(self.search_template)
+        response["segments"] = segments
+        response["pagination"] = {"total": count, "limit": max(count, 100), "offset": 0}
+        response["search"] = {"date": date or None, "from": from_station, "to": to_station}
+        return json.dumps(response, ensure_ascii=False).encode()
+
+    @lru_cache(maxsize=4096)
+    def thread_body(self, uid: str, count: int) -> bytes:
+        """Ответ thread/: остановки из thread.json, размноженные до count"""
+        template = self.thread_template["stops"]
+        count = max(count or len(template), 2)
+        middle = template[1:-1]
+
+        # первая и конечная остановки - как в фикстуре, промежуточные повторяются по кругу
+        stops = [copy.deepcopy(template[0])]
+        for index in range(1, count - 1):
+            stop = copy.deepcopy(middle[(index - 1) % len(middle)])
+            if index > len(middle):
+                stop["station"] = dict(stop["station"], title=f"Остановочный пункт {index}", code=f"s8{index:06d}")
+            stop["duration"] = index * 240.0
+            stops.append(stop)
+        stops.append(dict(copy.deepcopy(template[-1]), duration=(count - 1) * 240.0))
+
+        response = dict(self.thread_template, uid=uid, stops=stops)
+        return json.dumps(response, ensure_ascii=False).encode()
+
+
+def iter_stations(directory: Dict):
+    for country in directory["countries"]:
+        for region in country["regions"]:
+            for settlement in region["settlements"]:
+                yield from settlement["stations"]
+
+
+def station_object(station: Dict) -> Dict:
+    """Станция из справочника в виде, в котором она приходит в ответах search/ и thread/"""
+    return {
+        "type": "station",
+        "title": station["title"],
+        "short_title": "",
+        "popular_title": "",
+        "code": station["codes"]["yandex_code"],
+        "station_type": station["station_type"],
+        "station_type_name": "",
+        "transport_type": station["transport_type"],
+    }
+
+
+def synthetic_region(count: int) -> Dict:
+    """Регион с count станциями "Станция N" (по 100 в населенном пункте), виды транспорта - по очереди"""
+    settlements = []
+    for start in range(0, count, 100):
+        settlements.append(
+            {
+                "title": f"Населенный пункт {start // 100}",
+                "codes": {"yandex_code": f"c9{start // 100:06d}"},
+                "stations": [
+                    {
+                        "direction": "",
+                        "codes": {"yandex_code": f"s7{index:06d}"},
+                        "station_type": "station",
+                        "title": f"Станция {index}",
+                        "longitude": 37.0 + index % 1000 / 1000,
+                        "transport_type": TRANSPORT_TYPES[index % len(TRANSPORT_TYPES)],
+                        "latitude": 55.0 + index // 1000 / 1000,
+                    }
+                    for index in range(start, min(start + 100, count))
+                ],
+            }
+        )
+    return {"title": "Синтетический регион", "codes": {"yandex_code": "r999999"}, "settlements": settlements}
+
+
+def error_body(text: str, http_code: int) -> bytes:
+    return json.dumps({"error": {"text": text, "http_code": http_code}}, ensure_ascii=False).encode()
+
+
+class FakeRaspHandler(BaseHTTPRequestHandler):
+    api: FakeRaspAPI
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        status, body, headers = self.api.handle(url.path, query)
+
+        etag = headers.get("ETag")
+        if etag and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def start_server(api: FakeRaspAPI, host: str = "127.0.0.1", port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Запускает сервер в фоновом потоке
+
+    :return: (сервер, base_url для api.core)
+    """
+    handler = type("Handler", (FakeRaspHandler,), {"api": api})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-rasp", daemon=True).start()
+    return server, f"http://{host}:{server.server_port}{API_PREFIX}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--stations", type=int, default=0, help="число синтетических станций в справочнике")
+    parser.add_argument("--segments", type=int, default=0, help="число рейсов в ответе search/")
+    parser.add_argument("--stops", type=int, default=0, help="число остановок в ответе thread/")
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа, с")
+    parser.add_argument("--jitter", type=float, default=0.0, help="случайная добавка к задержке, до N с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов с ошибкой 500")
+    args = parser.parse_args()
+
+    api = FakeRaspAPI(
+        stations=args.stations,
+        segments=args.segments,
+        stops=args.stops,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+    )
+    handler = type("Handler", (FakeRaspHandler,), {"api": api})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"API Яндекс Расписаний (замена): http://{args.host}:{server.server_port}{API_PREFIX}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Микротесты скорости форматирования результатов поиска (api.core) и разбора рейсов (utils.utils).
+
+Для каждой функции и размера выдачи (1, 50, 500 и 5000 рейсов/остановок) измеряется время одного вызова
+(минимум из нескольких повторов timeit). Входные данные строятся локальной заменой API
+(benchmarks/fake_rasp.py) из фикстур benchmarks/fixtures, поэтому совпадают с ответами API по формату.
+
+Абсолютное время зависит от машины и ее загрузки, поэтому сравнивается отношение времени вызова к времени
+эталонной нагрузки (calibration): повторы замера чередуются с повторами эталона, и берется медиана
+отношений. Соотношение стоимости операций все же зависит от интерпретатора, поэтому базовые значения
+в benchmarks/formatting_baseline.json хранятся отдельно для каждой реализации и версии Python
+и архитектуры (baseline_key). Если какой-либо замер медленнее сохраненного больше чем в --threshold раз,
+тест завершается с кодом 1.
+
+--save сохраняет только новые замеры и замеры, изменившиеся больше чем в --threshold раз; остальные
+базовые значения (в том числе не выполненных замеров) остаются прежними.
+
+Запуск из корня проекта:
+    python -m benchmarks.formatting                    # замеры и сравнение с базовыми
+    python -m benchmarks.formatting --save             # сохранить новые и изменившиеся замеры
+    python -m benchmarks.formatting --filter format_page --sizes 500 5000
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks.fake_rasp import FakeRaspAPI
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "formatting_baseline.json")
+SIZES = (1, 50, 500, 5000)
+
+# станции из фикстур: пригородные поезда Москва (Белорусский вокзал) - Одинцово
+FROM_CODE = "s2000006"
+TO_CODE = "s9600721"
+DATE = "2026-05-01"
+
+
+def make_segments(api: FakeRaspAPI, size: int) -> List[Dict]:
+    return json.loads(api.search_body(FROM_CODE, TO_CODE, DATE, size))["segments"]
+
+
+def make_thread(api: FakeRaspAPI, size: int) -> Dict:
+    return json.loads(api.thread_body("6001_0_2000006_g26_4", size))
+
+
+def make_dates(size: int) -> List[str]:
+    """Введенные пользователями даты: корректные, несуществующие и не по шаблону"""
+    samples = ("01.05.2026", "31.12.2026", "29.02.2026", "1.5.2026", "01.05.2025", "завтра", "01-05-2026")
+    return [samples[index % len(samples)] for index in range(size)]
+
+
+def cases(api: FakeRaspAPI, sizes: Tuple[int, ...]) -> Dict[str, Callable[[], object]]:
+    """{название замера: функция без аргументов}. Данные готовятся заранее и в замер не входят"""
+    from api.core import (
+        format_page,
+        format_page_threads,
+        format_pages,
+        format_pages_threads,
+        format_segments,
+        format_threads,
+        normalize_segments,
+        show_route_stations,
+    )
+    from utils.utils import check_date, get_threads
+
+    result = {}
+    for size in sizes:
+        segments = make_segments(api, size)
+        table = normalize_segments(segments)
+        threads = get_threads(segments)
+        thread = make_thread(api, size)
+        dates = make_dates(size)
+        last_page = max((len(segments) + 4) // 5, 1)
+
+        result[f"format_segments[{size}]"] = lambda segments=segments: format_segments(segments)
+        result[f"format_page[{size}]"] = lambda segments=segments, page=last_page: format_page(segments, page)
+        result[f"format_pages[{size}]"] = lambda segments=segments: format_pages(segments)
+        result[f"normalize_segments[{size}]"] = lambda segments=segments: normalize_segments(segments)
+        result[f"format_pages_normalized[{size}]"] = lambda table=table: format_pages(table)
+        result[f"get_threads[{size}]"] = lambda segments=segments: get_threads(segments)
+        result[f"format_threads[{size}]"] = lambda threads=threads: format_threads(threads)
+        result[f"format_page_threads[{size}]"] = lambda threads=threads: format_page_threads(threads, 1)
+        result[f"format_pages_threads[{size}]"] = lambda threads=threads: format_pages_threads(threads)
+        result[f"show_route_stations[{size}]"] = lambda thread=thread: show_route_stations(thread)
+        result[f"check_date[{size}]"] = lambda dates=dates: [check_date(date) for date in dates]
+    return result
+
+
+def calibration() -> str:
+    """Эталонная нагрузка: те же операции, что и при форматировании (словари, f-строки, списки, join)"""
+    lines = []
+    for index in range(1000):
+        segment = {"number": index, "title": "Москва - Одинцово", "duration": index * 60}
+        hours, minutes = divmod(segment["duration"] // 60, 60)
+        lines.append(f"{segment['number']:>4} {segment['title']} {hours}:{minutes:02}")
+    return "\n".join(lines)
+
+
+def loops(timer: timeit.Timer, min_time: float) -> int:
+    """Число вызовов в одном повторе, чтобы повтор длился не меньше min_time секунд"""
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    return number
+
+
+def measure(function: Callable[[], object], repeat: int, min_time: float) -> Tuple[float, float]:
+    """Время одного вызова в секундах (минимум из repeat повторов) и отношение к времени эталона (медиана).
+    Повторы замера чередуются с повторами эталона, поэтому изменение скорости машины во время теста
+    сказывается на обоих одинаково
+    """
+    timers = (timeit.Timer(function), timeit.Timer(calibration))
+    numbers = [loops(timer, min_time) for timer in timers]
+    times, ratios = [], []
+    for _ in range(repeat):
+        seconds, unit = (timer.timeit(number) / number for timer, number in zip(timers, numbers))
+        times.append(seconds)
+        ratios.append(seconds / unit)
+    return min(times), statistics.median(ratios)
+
+
+def baseline_key() -> str:
+    """Раздел базовых значений для текущего интерпретатора, например CPython 3.11 x86_64"""
+    version = ".".join(platform.python_version_tuple()[:2])
+    return f"{platform.python_implementation()} {version} {platform.machine()}"
+
+
+def load_baseline() -> Dict:
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def changed(units: float, baseline: float, threshold: float) -> bool:
+    return not 1 / threshold <= units / baseline <= threshold
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="размеры выдачи")
+    parser.add_argument("--filter", default="", help="только замеры, в названии которых есть эта строка")
+    parser.add_argument("--repeat", type=int, default=5, help="число повторов каждого замера")
+    parser.add_argument("--min-time", type=float, default=0.05, help="минимальная длительность повтора, с")
+    parser.add_argument("--threshold", type=float, default=1.3, help="допустимое замедление относительно базовых")
+    parser.add_argument("--save", action="store_true", help="сохранить новые и изменившиеся замеры как базовые")
+    args = parser.parse_args()
+
+    key = baseline_key()
+    saved = load_baseline()
+    baseline = saved.get(key, {})
+    if not baseline:
+        print(f"Нет базовых значений для {key}\n")
+
+    results: Dict[str, float] = {}
+    regressions = []
+
+    print(f"{'замер':<32}{'мкс/вызов':>14}{'эталонов':>12}{'базовое':>12}{'отношение':>12}")
+    for name, function in cases(FakeRaspAPI(), tuple(args.sizes)).items():
+        if args.filter not in name:
+            continue
+
+        seconds, units = measure(function, args.repeat, args.min_time)
+        results[name] = units
+        line = f"{name:<32}{seconds * 1e6:>14.1f}{units:>12.4g}"
+        if name in baseline:
+            ratio = units / baseline[name]
+            line += f"{baseline[name]:>12.4g}{ratio:>11.2f}x"
+            if ratio > args.threshold:
+                regressions.append(name)
+                line += "  замедление"
+        print(line)
+
+    if args.save:
+        # перезаписываем только новые и изменившиеся сверх порога замеры: колебания в пределах порога
+        # и замеры, не попавшие в --filter/--sizes, не меняют базовые значения
+        updated = {
+            name: units
+            for name, units in results.items()
+            if name not in baseline or changed(units, baseline[name], args.threshold)
+        }
+        saved[key] = dict(sorted({**baseline, **updated}.items()))
+        with open(BASELINE_PATH, "w", encoding="utf-8") as file:
+            json.dump(dict(sorted(saved.items())), file, ensure_ascii=False, indent=2)
+            file.write("\n")
+        print(f"\nВ {BASELINE_PATH} ({key}) сохранено замеров: {len(updated)}")
+        if updated:
+            print(", ".join(updated))
+
+    elif regressions:
+        print(f"\nЗамедление больше чем в {args.threshold} раза: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
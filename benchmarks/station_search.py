@@ -0,0 +1,119 @@
+"""Нагрузочный тест поиска станций по неточному названию (database.station_search).
+
+Справочник - синтетические названия из случайных слогов (с номерами и типами пунктов: "платформа",
+"о.п." и т.п.). Запросы - названия из справочника с одной опечаткой (замена, пропуск или вставка буквы),
+начала названий и несуществующие названия. Тест выводит время построения индекса, время одного поиска
+(среднее, перцентили, максимум) и долю запросов с опечаткой, для которых исходное название попало
+в предложенные.
+
+Запуск из корня проекта:
+    python -m benchmarks.station_search --titles 200000 --queries 2000
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from typing import List, Tuple
+
+from database.station_search import StationSearch
+
+SYLLABLES = (
+    "ка", "но", "ва", "ли", "ро", "мо", "ск", "ов", "ин", "ая", "ер", "ки",
+    "ту", "ла", "пе", "ре", "го", "де", "зе", "ны", "чи", "шо", "бу", "ха",
+)
+KINDS = ("", "", "", " (платформа)", " ст.", " о.п.", " км", " вокзал", " аэропорт", " автостанция")
+LETTERS = "абвгдежзиклмнопрст"
+
+
+def word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def make_titles(rng: random.Random, count: int) -> List[str]:
+    titles = set()
+    while len(titles) < count:
+        title = word(rng)
+        if rng.random() < 0.4:
+            title += " " + word(rng)
+        if rng.random() < 0.2:
+            title += f" {rng.randint(1, 300)}"
+        titles.add(title + rng.choice(KINDS))
+    return sorted(titles)
+
+
+def typo(rng: random.Random, title: str) -> str:
+    """Название с одной опечаткой: замена, пропуск или вставка буквы"""
+    letters = list(title.lower())
+    index = rng.randrange(len(letters))
+    kind = rng.random()
+    if kind < 0.4:
+        letters[index] = rng.choice(LETTERS)
+    elif kind < 0.7:
+        del letters[index]
+    else:
+        letters.insert(index, rng.choice(LETTERS))
+    return "".join(letters)
+
+
+def make_queries(rng: random.Random, titles: List[str], count: int) -> List[Tuple[str, str | None]]:
+    """[(запрос, исходное название или None)]: 70% - с опечаткой, 15% - начала названий, 15% - несуществующие"""
+    queries = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.7:
+            title = rng.choice(titles)
+            queries.append((typo(rng, title), title))
+        elif kind < 0.85:
+            queries.append((rng.choice(titles)[: rng.randint(3, 6)], None))
+        else:
+            queries.append((f"{word(rng)} {word(rng)}", None))
+    return queries
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--titles", type=int, default=200000, help="названий в справочнике")
+    parser.add_argument("--queries", type=int, default=2000, help="число запросов")
+    parser.add_argument("--limit", type=int, default=5, help="сколько названий предлагать")
+    parser.add_argument("--seed", type=int, default=7, help="начальное значение генератора случайных чисел")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    titles = make_titles(rng, args.titles)
+    queries = make_queries(rng, titles, args.queries)
+
+    started = time.perf_counter()
+    search = StationSearch(titles)
+    build_s = time.perf_counter() - started
+
+    for query, _ in queries[:50]:  # прогрев
+        search.search(query, args.limit)
+
+    times = []
+    found = typos = 0
+    for query, title in queries:
+        started = time.perf_counter()
+        result = search.search(query, args.limit)
+        times.append(time.perf_counter() - started)
+        if title is not None:
+            typos += 1
+            found += title in result
+
+    times.sort()
+    result = {
+        "config": vars(args),
+        "build_s": round(build_s, 2),
+        "search_ms": {
+            "avg": round(statistics.mean(times) * 1000, 3),
+            "p50": round(times[len(times) // 2] * 1000, 3),
+            "p99": round(times[min(int(len(times) * 0.99), len(times) - 1)] * 1000, 3),
+            "max": round(times[-1] * 1000, 3),
+        },
+        "typos_found": round(found / typos, 3) if typos else None,
+    }
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
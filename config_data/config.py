@@ -10,6 +10,91 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 API_KEY = os.getenv("API_KEY")
 DB_PATH = "database.db"
 
+# профиль SQLite: режим журнала, режим синхронизации с диском, размер кэша страниц (в КиБ) и объем файла БД,
+# отображаемого в память (в байтах), а также сколько секунд ждать, пока другой поток освободит БД для записи
+DB_JOURNAL_MODE = os.getenv("DB_JOURNAL_MODE", "wal")
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "normal")
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", 64 * 1024))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", 256 * 1024 * 1024))
+DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", 10))
+
+# адрес API Яндекс Расписаний (для нагрузочных тестов - адрес локальной замены из benchmarks/fake_rasp.py)
+RASP_BASE_URL = os.getenv("RASP_BASE_URL", "https://api.rasp.yandex-net.ru/v3.0/")
+
+# пул соединений и таймауты (в секундах) для запросов к API Яндекс Расписаний
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", 10))
+API_CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", 3.05))
+API_READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", 15))
+# максимум одновременных соединений с API в асинхронном режиме (main_async.py)
+ASYNC_API_POOL_SIZE = int(os.getenv("ASYNC_API_POOL_SIZE", 100))
+
+# кэш ответов поиска рейсов: время жизни (в секундах) для поиска на дату и без даты (/route_stations),
+# объем в памяти (в байтах JSON) и сохранение в БД, чтобы кэш переживал перезапуск
+ROUTES_CACHE_TTL = int(os.getenv("ROUTES_CACHE_TTL", 10 * 60))
+ROUTE_STATIONS_CACHE_TTL = int(os.getenv("ROUTE_STATIONS_CACHE_TTL", 6 * 60 * 60))
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+SEARCH_CACHE_PERSISTENT = os.getenv("SEARCH_CACHE_PERSISTENT", "0") == "1"
+
+# кэш станций следования маршрутов в БД: время жизни (в секундах) и максимальное число маршрутов
+THREAD_CACHE_TTL = int(os.getenv("THREAD_CACHE_TTL", 24 * 60 * 60))
+THREAD_CACHE_MAX_ROWS = int(os.getenv("THREAD_CACHE_MAX_ROWS", 20000))
+
+# хранилище готовых страниц результатов поиска для кнопок пагинации: время жизни (в секундах),
+# максимальное число результатов в памяти и сохранение в БД, чтобы кнопки работали после перезапуска
+RESULTS_TTL = int(os.getenv("RESULTS_TTL", 24 * 60 * 60))
+RESULTS_MAX_ENTRIES = int(os.getenv("RESULTS_MAX_ENTRIES", 10000))
+RESULTS_PERSISTENT = os.getenv("RESULTS_PERSISTENT", "1") == "1"
+
+# сколько зарегистрированных пользователей держать в памяти, чтобы не проверять их регистрацию в БД
+USER_REGISTRY_SIZE = int(os.getenv("USER_REGISTRY_SIZE", 100000))
+
+# фоновая запись истории поиска: сколько запросов записывать одной пачкой и как часто (в секундах)
+HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", 100))
+HISTORY_FLUSH_INTERVAL = float(os.getenv("HISTORY_FLUSH_INTERVAL", 1.0))
+# история поиска для /history: сколько последних запросов показывать (и хранить в памяти для каждого
+# пользователя), для скольких пользователей хранить их в памяти, сколько запросов каждого пользователя
+# оставлять в БД и как часто (в секундах) удалять более старые
+HISTORY_SIZE = int(os.getenv("HISTORY_SIZE", 10))
+HISTORY_CACHED_USERS = int(os.getenv("HISTORY_CACHED_USERS", 10000))
+HISTORY_KEEP = int(os.getenv("HISTORY_KEEP", 100))
+HISTORY_PRUNE_INTERVAL = float(os.getenv("HISTORY_PRUNE_INTERVAL", 60 * 60))
+
+# количество строк в одном INSERT при загрузке справочника станций
+STATIONS_BATCH_SIZE = int(os.getenv("STATIONS_BATCH_SIZE", 500))
+# максимальная доля станций, которую может удалить одно обновление справочника (большая доля скорее
+# означает неполный ответ API, и такое обновление не применяется)
+STATIONS_MAX_DELETE_SHARE = float(os.getenv("STATIONS_MAX_DELETE_SHARE", 0.2))
+# локальный снимок справочника станций для старта без обращения к API
+STATIONS_SNAPSHOT_PATH = os.getenv("STATIONS_SNAPSHOT_PATH", "stations.snapshot.gz")
+# сколько похожих названий предлагать, если введенного пункта нет в справочнике
+STATION_SUGGESTIONS_LIMIT = int(os.getenv("STATION_SUGGESTIONS_LIMIT", 5))
+
+# состояния диалогов: через сколько секунд неактивный диалог удаляется, сколько диалогов держать в памяти
+# и максимальный размер данных одного диалога (в байтах JSON), сохраняемых в БД
+STATE_TTL = int(os.getenv("STATE_TTL", 24 * 60 * 60))
+STATE_CACHE_SIZE = int(os.getenv("STATE_CACHE_SIZE", 10000))
+STATE_MAX_BYTES = int(os.getenv("STATE_MAX_BYTES", 256 * 1024))
+
+# обработка обновлений: число потоков-обработчиков и общий размер их очередей
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", 8))
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", 1000))
+
+# исходящие сообщения: не больше SEND_GLOBAL_RATE сообщений в секунду всего и SEND_CHAT_RATE в один чат
+# (до SEND_CHAT_BURST подряд), число потоков отправки и число повторов после ответа Telegram 429
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", 30))
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", 1))
+SEND_CHAT_BURST = float(os.getenv("SEND_CHAT_BURST", 3))
+SEND_WORKERS = int(os.getenv("SEND_WORKERS", 8))
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", 3))
+
+# режим вебхука (webhook.py): публичный адрес сервера (если пустой - вебхук в Telegram не регистрируется),
+# адрес и порт локального HTTP-сервера, путь для обновлений и секретный токен для проверки запросов
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 8443))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+
 DEFAULT_COMMANDS = (
     ("start", "Запуск бота"),
     ("hello_world", "Знакомство с ботом"),
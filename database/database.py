@@ -5,11 +5,31 @@ from peewee import (
     IntegerField,
     AutoField,
     ForeignKeyField,
+    TextField,
+    FloatField,
+    CompositeKey,
 )
 
-from config_data.config import DB_PATH
+from config_data.config import (
+    DB_BUSY_TIMEOUT,
+    DB_CACHE_SIZE_KB,
+    DB_JOURNAL_MODE,
+    DB_MMAP_SIZE,
+    DB_PATH,
+    DB_SYNCHRONOUS,
+)
+
+# настройки применяются к каждому новому соединению: в режиме WAL чтение не блокируется записью,
+# а synchronous=NORMAL не делает fsync при каждой фиксации транзакции
+pragmas = {
+    "journal_mode": DB_JOURNAL_MODE,
+    "synchronous": DB_SYNCHRONOUS,
+    "cache_size": -DB_CACHE_SIZE_KB,  # отрицательное значение - размер в КиБ, а не в страницах
+    "mmap_size": DB_MMAP_SIZE,
+}
 
-db = SqliteDatabase(DB_PATH)
+# у каждого потока свое соединение (потоки-обработчики обновлений держат его открытым все время работы)
+db = SqliteDatabase(DB_PATH, pragmas=pragmas, timeout=DB_BUSY_TIMEOUT)
 
 
 class BaseModel(Model):
@@ -30,9 +50,35 @@ class Station(BaseModel):
         indexes = (
             (("title",), False),
             (("transport_type",), False),
+            (("code",), False),
         )
 
 
+class Setting(BaseModel):
+    """Служебные значения бота (например, хэш и ETag последней загрузки справочника станций)"""
+
+    key = CharField(primary_key=True)
+    value = TextField()
+
+    @classmethod
+    def read(cls, key: str) -> str | None:
+        setting = cls.get_or_none(cls.key == key)
+        return setting.value if setting else None
+
+    @classmethod
+    def write(cls, key: str, value: str) -> None:
+        cls.replace(key=key, value=value).execute()
+
+
+class ThreadCache(BaseModel):
+    """Сохраненные станции следования маршрутов (нитей) из выдачи API thread/"""
+
+    uid = CharField(primary_key=True)  # идентификатор маршрута
+    stops = TextField()  # JSON-список остановок [[название_станции, стоянка, время_в_пути], ...]
+    text = TextField()  # готовый текст ответа пользователю (результат show_route_stations)
+    fetched_at = FloatField(index=True)  # время получения от API (unix time)
+
+
 class Search(BaseModel):
     search_id = AutoField()
     user = ForeignKeyField(User, backref="history")
@@ -62,7 +108,36 @@ class Search(BaseModel):
             )
 
 
+class ApiCache(BaseModel):
+    """Сохраненные ответы API Яндекс Расписаний (для кэша, переживающего перезапуск бота)"""
+
+    key = CharField(primary_key=True)
+    value = TextField()  # JSON ответа
+    expires_at = FloatField(index=True)  # время истечения срока жизни (unix time)
+
+
+class SearchResult(BaseModel):
+    """Готовые страницы результатов поиска (хранилище database.result_store.ResultStore)"""
+
+    rid = CharField(primary_key=True)  # идентификатор результата из callback_data кнопок пагинации
+    pages = TextField()  # JSON-список текстов страниц
+    expires_at = FloatField(index=True)  # время истечения срока жизни (unix time)
+
+
+class DialogState(BaseModel):
+    """Состояния и данные диалогов пользователей (хранилище states.storage.SQLiteStateStorage)"""
+
+    chat_id = IntegerField()
+    user_id = IntegerField()
+    state = CharField(null=True)
+    data = TextField()  # JSON данных диалога
+    updated_at = FloatField(index=True)  # время последнего изменения (unix time)
+
+    class Meta:
+        primary_key = CompositeKey("chat_id", "user_id")
+
+
 def create_tables():
     db.connect(reuse_if_open=True)
-    db.create_tables([User, Station, Search])
+    db.create_tables([User, Station, ThreadCache, Search, Setting, ApiCache, DialogState, SearchResult])
     db.close()
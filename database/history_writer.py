@@ -0,0 +1,233 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Tuple
+
+from peewee import IntegrityError, fn
+
+from config_data.config import (
+    HISTORY_BATCH_SIZE,
+    HISTORY_CACHED_USERS,
+    HISTORY_FLUSH_INTERVAL,
+    HISTORY_KEEP,
+    HISTORY_PRUNE_INTERVAL,
+    HISTORY_SIZE,
+)
+from database.database import Search, db
+
+logger = logging.getLogger(__name__)
+
+# сколько раз подряд повторять запись пачки после временной ошибки (например, БД заблокирована),
+# прежде чем отказаться от нее
+FLUSH_RETRIES = 5
+
+
+class HistoryWriter:
+    """Фоновая запись истории поиска (таблица Search) пачками и последние запросы пользователей в памяти.
+
+    Обработчики только ставят запись в очередь (add), а фоновый поток записывает накопленные строки одним
+    insert_many, когда их набирается batch_size или проходит flush_interval секунд, а также при остановке.
+    Номер запроса (search_id) выдается сразу при постановке в очередь. Пачка, которую не удалось записать,
+    записывается повторно (не больше FLUSH_RETRIES раз подряд), а строки, которые нельзя записать
+    (например, номер запроса уже занят другим процессом), пропускаются с записью в лог.
+
+    Для /history у пользователя хранится кольцо из history_size последних запросов в виде готовых строк.
+    Кольцо загружается из БД при первом обращении (по индексу Search.user), затем пополняется в add(),
+    кольца хранятся для cached_users недавно активных пользователей. Раз в prune_interval секунд из БД
+    удаляются старые запросы: каждому пользователю остаются последние keep.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        flush_interval: float,
+        history_size: int,
+        cached_users: int,
+        keep: int,
+        prune_interval: float,
+    ) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.history_size = history_size
+        self.cached_users = cached_users
+        self.keep = keep
+        self.prune_interval = prune_interval
+
+        self._pending: List[Dict] = []
+        self._flushing: List[Dict] = []  # строки, которые сейчас записываются в БД
+        self._next_id: int | None = None
+        self._failed_flushes = 0
+        self._rings: "OrderedDict[int, Deque[Tuple[int, str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def add(self, **fields) -> int:
+        """Ставит запрос в очередь на запись (поля - как у модели Search, user - идентификатор пользователя)
+
+        :return: номер запроса (search_id)
+        """
+        with self._lock:
+            if self._next_id is None:
+                self._next_id = (Search.select(fn.MAX(Search.search_id)).scalar() or 0) + 1
+
+            search_id = self._next_id
+            self._next_id += 1
+            row = {"search_id": search_id, **fields}
+            self._pending.append(row)
+
+            ring = self._rings.get(row["user"])
+            if ring is not None:
+                ring.appendleft((search_id, str(Search(**row))))
+
+            full = len(self._pending) >= self.batch_size
+
+        if full:
+            self._wakeup.set()
+        return search_id
+
+    def recent(self, user_id: int, limit: int = 10) -> List[str]:
+        """Последние limit запросов пользователя, включая еще не записанные в БД (от свежих к менее свежим)"""
+        with self._lock:
+            ring = self._rings.get(user_id)
+            if ring is None:
+                ring = self._load_ring(user_id)
+
+            self._rings[user_id] = ring
+            self._rings.move_to_end(user_id)
+            while len(self._rings) > self.cached_users:
+                self._rings.popitem(last=False)
+
+            return [text for _, text in list(ring)[:limit]]
+
+    def _load_ring(self, user_id: int) -> Deque[Tuple[int, str]]:
+        # вызывается под self._lock, поэтому новые запросы пользователя не могут появиться во время загрузки,
+        # а уже принятые находятся либо в очереди, либо в БД
+        rows = [row for row in self._pending + self._flushing if row["user"] == user_id]
+        searches = {row["search_id"]: Search(**row) for row in rows}
+
+        query = (
+            Search.select()
+            .where(Search.user == user_id)
+            .order_by(Search.search_id.desc())
+            .limit(self.history_size)
+        )
+        for search in query:
+            searches.setdefault(search.search_id, search)
+
+        entries = sorted(((search_id, str(search)) for search_id, search in searches.items()), reverse=True)
+        return deque(entries[: self.history_size], maxlen=self.history_size)
+
+    def flush(self) -> int:
+        """Записывает накопленные запросы в БД
+
+        :return: количество записанных запросов
+        """
+        with self._lock:
+            rows, self._pending = self._pending, []
+            self._flushing = rows
+
+        if not rows:
+            return 0
+
+        written = 0
+        try:
+            with db.atomic():
+                Search.insert_many(rows).execute()
+            written = len(rows)
+        except IntegrityError:
+            # ошибка не исчезнет при повторе: записываем строки по одной, пропуская ошибочные
+            written = self._insert_one_by_one(rows)
+        except Exception:
+            self._failed_flushes += 1
+            if self._failed_flushes < FLUSH_RETRIES:
+                logger.exception("Не удалось записать историю поиска (%d запросов), повторим позже", len(rows))
+                with self._lock:
+                    self._pending[:0] = rows
+                    self._flushing = []
+                return 0
+
+            logger.exception(
+                "Не удалось записать историю поиска после %d попыток, запросы пропущены: %s",
+                self._failed_flushes,
+                rows,
+            )
+
+        self._failed_flushes = 0
+        with self._lock:
+            self._flushing = []
+        return written
+
+    def _insert_one_by_one(self, rows: List[Dict]) -> int:
+        written = 0
+        for row in rows:
+            try:
+                Search.insert(**row).execute()
+                written += 1
+            except IntegrityError as error:
+                logger.error("Запрос пропущен при записи истории поиска (%s): %s", error, row)
+
+        # номера запросов могли занять другие процессы, работающие с той же БД: следующий номер берем из БД
+        with self._lock:
+            self._next_id = None
+        return written
+
+    def prune(self) -> int:
+        """Удаляет из БД старые запросы, оставляя каждому пользователю последние keep
+
+        :return: количество удаленных запросов
+        """
+        # запросы, которые показываются в /history, не удаляются, даже если keep меньше history_size
+        keep = max(self.keep, self.history_size)
+        ranked = Search.select(
+            Search.search_id,
+            fn.ROW_NUMBER().over(partition_by=[Search.user], order_by=[Search.search_id.desc()]).alias("position"),
+        ).alias("ranked")
+        old = Search.select(ranked.c.search_id).from_(ranked).where(ranked.c.position > keep)
+
+        deleted = Search.delete().where(Search.search_id.in_(old)).execute()
+        if deleted:
+            logger.info("Из истории поиска удалено старых запросов: %d", deleted)
+        return deleted
+
+    def _run(self) -> None:
+        pruned_at = 0.0
+        with db.connection_context():
+            while not self._stopped.is_set():
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                self.flush()
+
+                if time.monotonic() - pruned_at >= self.prune_interval:
+                    pruned_at = time.monotonic()
+                    try:
+                        self.prune()
+                    except Exception:
+                        logger.exception("Не удалось удалить старые запросы из истории поиска")
+
+    def start(self) -> "HistoryWriter":
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Останавливает фоновый поток и записывает оставшиеся запросы"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+
+history_writer = HistoryWriter(
+    batch_size=HISTORY_BATCH_SIZE,
+    flush_interval=HISTORY_FLUSH_INTERVAL,
+    history_size=HISTORY_SIZE,
+    cached_users=HISTORY_CACHED_USERS,
+    keep=HISTORY_KEEP,
+    prune_interval=HISTORY_PRUNE_INTERVAL,
+)
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Tuple
+
+from config_data.config import RESULTS_MAX_ENTRIES, RESULTS_PERSISTENT, RESULTS_TTL
+from database.database import SearchResult
+
+# как часто (раз в сколько записей) из БД удаляются устаревшие результаты
+PURGE_EVERY = 500
+
+
+def result_id(key: str, pages: List[str]) -> str:
+    """Короткий идентификатор результата поиска для callback_data кнопок пагинации.
+
+    Вычисляется из параметров поиска и текста страниц: одинаковые результаты одинаковых поисков разных
+    пользователей хранятся один раз, а разные результаты одного поиска (например, до и после устаревания
+    кэша API) никогда не занимают одну запись. Иначе страницы нового результата заменили бы страницы,
+    которые листает пользователь, и номер маршрута в них не совпал бы с его сохраненным списком маршрутов
+    """
+    digest = hashlib.blake2b(key.encode(), digest_size=8)
+    for page in pages:
+        digest.update(b"\0")
+        digest.update(page.encode())
+    return digest.hexdigest()
+
+
+class ResultStore:
+    """Общее хранилище готовых страниц результатов поиска: {идентификатор_результата: [текст_страницы, ...]}.
+
+    Кнопки пагинации содержат идентификатор результата, поэтому любую страницу недавнего результата
+    можно показать независимо от состояния диалога пользователя. В памяти хранится не больше max_entries
+    последних результатов, каждый - ttl секунд. Если persistent=True, результаты дополнительно
+    сохраняются в таблицу SearchResult и переживают перезапуск бота.
+    """
+
+    def __init__(self, ttl: int, max_entries: int, persistent: bool = False) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.persistent = persistent
+
+        self._entries: "OrderedDict[str, Tuple[float, List[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def put(self, key: str, pages: List[str]) -> str:
+        """Сохраняет страницы результата поиска с параметрами key
+
+        :return: идентификатор результата
+        """
+        rid = result_id(key, pages)
+        expires_at = time.time() + self.ttl
+        self._remember(rid, pages, expires_at)
+
+        if self.persistent:
+            SearchResult.replace(
+                rid=rid,
+                pages=json.dumps(pages, ensure_ascii=False),
+                expires_at=expires_at,
+            ).execute()
+            with self._lock:
+                self._writes += 1
+                purge = self._writes % PURGE_EVERY == 0
+            if purge:
+                SearchResult.delete().where(SearchResult.expires_at <= time.time()).execute()
+
+        return rid
+
+    def get(self, rid: str) -> List[str] | None:
+        """Возвращает страницы результата (или None, если результат неизвестен или устарел)"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(rid)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(rid)
+                    return entry[1]
+                del self._entries[rid]
+
+        if self.persistent:
+            row = SearchResult.get_or_none((SearchResult.rid == rid) & (SearchResult.expires_at > now))
+            if row is not None:
+                pages = json.loads(row.pages)
+                self._remember(rid, pages, row.expires_at)
+                return pages
+
+        return None
+
+    def _remember(self, rid: str, pages: List[str], expires_at: float) -> None:
+        with self._lock:
+            self._entries[rid] = (expires_at, pages)
+            self._entries.move_to_end(rid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+result_store = ResultStore(ttl=RESULTS_TTL, max_entries=RESULTS_MAX_ENTRIES, persistent=RESULTS_PERSISTENT)
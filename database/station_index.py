@@ -0,0 +1,65 @@
+import threading
+from typing import Callable, Dict, List
+
+from database.database import Station
+
+
+class StationIndex:
+    """Индекс справочника станций в памяти: {название_станции: {вид_транспорта: код_станции}}.
+
+    Строится один раз из таблицы Station (при первом обращении) и используется обработчиками и
+    search_routes_between, чтобы проверка названий и поиск кодов станций не обращались к БД.
+    После изменения таблицы Station необходимо вызвать invalidate().
+    """
+
+    def __init__(self) -> None:
+        self._titles: Dict[str, Dict[str, str]] | None = None
+        self._lock = threading.Lock()
+        self._hooks: List[Callable[[], None]] = []
+
+    def _build(self) -> Dict[str, Dict[str, str]]:
+        titles = {}
+        query = Station.select(Station.title, Station.transport_type, Station.code).order_by(Station.id)
+        for title, transport_type, code in query.tuples().iterator():
+            # как и прежний запрос .first(), берем первую станцию с таким названием и видом транспорта
+            titles.setdefault(title, {}).setdefault(transport_type, code)
+        return titles
+
+    @property
+    def titles(self) -> Dict[str, Dict[str, str]]:
+        titles = self._titles
+        if titles is None:
+            with self._lock:
+                if self._titles is None:
+                    self._titles = self._build()
+                titles = self._titles
+        return titles
+
+    def __contains__(self, title: str) -> bool:
+        return title in self.titles
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def get_code(self, title: str, transport_type: str) -> str | None:
+        """Возвращает код станции с указанным названием для вида транспорта (или None, если такой нет)"""
+        return self.titles.get(title, {}).get(transport_type)
+
+    def invalidate(self) -> None:
+        """Перестраивает индекс после изменения таблицы Station.
+
+        Новый индекс строится целиком и только затем подменяет старый, поэтому параллельные
+        запросы до конца перестроения продолжают работать с прежними данными.
+        """
+        with self._lock:
+            self._titles = self._build()
+
+        for hook in self._hooks:
+            hook()
+
+    def add_invalidation_hook(self, hook: Callable[[], None]) -> None:
+        """Регистрирует функцию, вызываемую после каждого перестроения индекса"""
+        self._hooks.append(hook)
+
+
+station_index = StationIndex()
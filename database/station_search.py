@@ -0,0 +1,268 @@
+import heapq
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import compress, islice
+from typing import Dict, Iterable, List, Tuple
+
+from peewee import fn
+
+from database.database import Station
+from database.station_index import station_index
+
+_punctuation_re = re.compile(r"[^\w]+")
+
+# сколько вхождений четырехграмм просматривается при отборе кандидатов для поиска с опечатками:
+# четырехграммы запроса обходятся от редких к частым, а самые частые почти не влияют на результат.
+# Если даже самая редкая четырехграмма запроса встречается чаще, берутся только первые ее вхождения
+POSTINGS_BUDGET = 1500
+
+# сколько лучших кандидатов сравнивается с запросом по полному набору триграмм
+CANDIDATES = 50
+
+# минимальная доля общих триграмм (коэффициент Дайса), при которой название предлагается пользователю
+MIN_SIMILARITY = 0.3
+
+# для префиксов, с которых начинается больше SHORTLIST_FROM названий, кратчайшие SHORTLIST_SIZE из них
+# находятся при построении индекса: иначе короткий запрос (например, из одной буквы) обходил бы тысячи названий
+SHORTLIST_FROM = 256
+SHORTLIST_SIZE = 20
+
+
+def normalize(text: str) -> str:
+    """Приводит название станции к виду для поиска: нижний регистр, ё -> е, без знаков препинания"""
+    text = text.lower().replace("ё", "е")
+    return " ".join(_punctuation_re.sub(" ", text).split())
+
+
+def trigrams(key: str) -> set:
+    """Триграммы нормализованного названия (с пробелами по краям, чтобы учитывать начало и конец слова)"""
+    padded = f" {key} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def fourgrams(key: str) -> set:
+    """Четырехграммы нормализованного названия: по ним отбираются кандидаты для поиска с опечатками.
+
+    Четырехграммы встречаются реже триграмм, поэтому при том же числе просмотренных вхождений
+    кандидаты отбираются по большему числу n-грамм запроса и точнее
+    """
+    padded = f" {key} "
+    return {padded[i : i + 4] for i in range(len(padded) - 3)}
+
+
+def most_common(common: Counter, count: int) -> List[int]:
+    """Те же ключи, что и в common.most_common(count), но без сортировки всех кандидатов.
+
+    Число общих триграмм невелико, поэтому сначала по гистограмме находится порог - наименьшее значение
+    среди count лучших, а затем ключи отбираются встроенными функциями без цикла на Python
+    """
+    if len(common) <= count:
+        return list(common)
+
+    histogram = Counter(common.values())
+    above = 0
+    for threshold in sorted(histogram, reverse=True):
+        if above + histogram[threshold] >= count:
+            break
+        above += histogram[threshold]
+
+    best = list(compress(common, map(threshold.__lt__, common.values())))
+    # из равных порогу, как и most_common, берем встретившиеся раньше
+    best.extend(islice(compress(common, map(threshold.__eq__, common.values())), count - len(best)))
+    return best
+
+
+def shortlists(keys: List[str]) -> Dict[str, array]:
+    """{префикс: номера SHORTLIST_SIZE кратчайших названий с этим префиксом} для префиксов, с которых
+    начинается больше SHORTLIST_FROM названий (keys отсортированы). При равной длине названия идут
+    в порядке keys, как и при сортировке диапазона префикса
+    """
+    result = {}
+    ranges = [(0, len(keys))]
+    depth = 1
+    while ranges:
+        # диапазоны префиксов длины depth внутри частых префиксов длины depth - 1
+        nested = []
+        for start, end in ranges:
+            index = start
+            while index < end:
+                # название, совпадающее с более коротким префиксом, стоит в начале его диапазона
+                if len(keys[index]) < depth:
+                    index += 1
+                    continue
+                prefix = keys[index][:depth]
+                stop = bisect_left(keys, prefix + "\uffff", index, end)
+                if stop - index > SHORTLIST_FROM:
+                    shortest = heapq.nsmallest(SHORTLIST_SIZE, range(index, stop), key=lambda i: len(keys[i]))
+                    result[prefix] = array("I", shortest)
+                    nested.append((index, stop))
+                index = stop
+        ranges = nested
+        depth += 1
+    return result
+
+
+class StationSearch:
+    """Поиск станций по неточному названию.
+
+    Индекс состоит из отсортированного списка нормализованных названий (поиск по префиксу через bisect,
+    для частых префиксов - готовые списки кратчайших названий) и индекса {четырехграмма: номера названий} для отбора кандидатов при поиске с опечатками;
+    кандидаты ранжируются по доле общих с запросом триграмм.
+    Строится один раз из индекса станций и перестраивается при его обновлении.
+    """
+
+    def __init__(self, titles: Iterable[str] = ()) -> None:
+        self._index = self._make_index(titles)
+
+    @staticmethod
+    def _make_index(
+        titles: Iterable[str],
+    ) -> Tuple[List[str], List[str], Dict[str, array], array, Dict[str, array]]:
+        pairs = sorted((normalize(title), title) for title in set(titles))
+        keys = [key for key, _ in pairs]
+        originals = [title for _, title in pairs]
+
+        postings: Dict[str, array] = {}
+        sizes = array("H")  # число разных триграмм в каждом названии
+        for title_id, key in enumerate(keys):
+            sizes.append(min(len(trigrams(key)), 0xFFFF))
+            for gram in fourgrams(key):
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array("I")
+                posting.append(title_id)
+
+        return keys, originals, postings, sizes, shortlists(keys)
+
+    def __len__(self) -> int:
+        return len(self._index[0])
+
+    def search(self, query: str, limit: int = 5) -> List[str]:
+        """Возвращает до limit названий станций, наиболее похожих на запрос (от лучшего к худшему).
+
+        Сначала идут точные совпадения без учета регистра, ё/е и знаков препинания, затем названия,
+        начинающиеся с запроса, затем - ближайшие по доле общих триграмм.
+        """
+        # индекс подменяется целиком, поэтому берем его один раз: параллельная перестройка не помешает запросу
+        keys, originals, postings, sizes, prefixes = self._index
+        key = normalize(query)
+        if not key or not keys:
+            return []
+
+        result = []
+        seen = set()
+
+        # точные совпадения и совпадения по префиксу (короткие названия - выше)
+        start = bisect_left(keys, key)
+        end = bisect_left(keys, key + "\uffff", start)
+        if end - start > SHORTLIST_FROM and limit <= SHORTLIST_SIZE:
+            shortest = prefixes[key][:limit]
+        else:
+            shortest = heapq.nsmallest(limit, range(start, end), key=lambda i: len(keys[i]))
+        for title_id in shortest:
+            result.append(originals[title_id])
+            seen.add(title_id)
+
+        if len(result) >= limit:
+            return result
+
+        # поиск с опечатками: отбираем кандидатов по самым редким четырехграммам запроса...
+        common = Counter()
+        budget = POSTINGS_BUDGET
+        for posting in sorted((postings[gram] for gram in fourgrams(key) if gram in postings), key=len):
+            if len(posting) > budget:
+                if not common:
+                    common.update(posting[:budget])
+                break
+            common.update(posting)
+            budget -= len(posting)
+
+        # ...и ранжируем их по доле общих триграмм с запросом (коэффициент Дайса). Триграмма запроса есть
+        # в названии, если она встречается в нем как подстрока, поэтому множества триграмм не строим
+        query_grams = trigrams(key)
+        scored = []
+        for title_id in most_common(common, CANDIDATES):
+            if title_id not in seen:
+                padded = f" {keys[title_id]} "
+                shared = sum(gram in padded for gram in query_grams)
+                score = 2 * shared / (len(query_grams) + sizes[title_id])
+                scored.append((-score, len(keys[title_id]), title_id))
+
+        for score, _, title_id in sorted(scored)[: limit - len(result)]:
+            if -score < MIN_SIMILARITY:
+                break
+            result.append(originals[title_id])
+
+        return result
+
+
+class _IndexedStationSearch(StationSearch):
+    """Поиск по станциям из station_index, перестраиваемый при обновлении справочника.
+
+    Новый индекс строится в стороне и подменяет прежний целиком, а до тех пор запросы обслуживает прежний:
+    поиск никогда не ждет перестройки. Пока индекс не построен ни разу (при запуске бота), названия
+    ищутся в таблице Station (search_table)
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._source = None
+        self._build_lock = threading.Lock()
+
+    def build(self) -> None:
+        """Строит индекс поиска по текущему справочнику (при старте бота и после обновления справочника)"""
+        with self._build_lock:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        titles = station_index.titles
+        if self._source is not titles:
+            self._index = self._make_index(titles)
+            self._source = titles
+
+    def _rebuild_in_background(self) -> None:
+        try:
+            self._rebuild()
+        finally:
+            self._build_lock.release()
+
+    def search(self, query: str, limit: int = 5) -> List[str]:
+        # справочник обновился, а индекс еще нет: перестраиваем его в фоне (если это уже не делается)
+        if self._source is not station_index.titles and self._build_lock.acquire(blocking=False):
+            threading.Thread(target=self._rebuild_in_background, name="station-search-build", daemon=True).start()
+        if self._source is None:
+            return search_table(query, limit)
+        return super().search(query, limit)
+
+
+def search_table(query: str, limit: int) -> List[str]:
+    """Названия станций из таблицы Station, содержащие запрос (короткие - выше). Без опечаток и без учета
+    знаков препинания: используется, только пока не построен индекс поиска.
+
+    LIKE в SQLite не различает регистр только латинских букв, поэтому запрос ищется в том виде,
+    в котором введен, в нижнем регистре и с заглавной буквы
+    """
+    text = " ".join(query.split())
+    if not text:
+        return []
+
+    condition = None
+    for variant in {text, text.lower(), text.capitalize()}:
+        contains = Station.title.contains(variant)
+        condition = contains if condition is None else condition | contains
+
+    query = (
+        Station.select(Station.title)
+        .where(condition)
+        .group_by(Station.title)
+        .order_by(fn.LENGTH(Station.title), Station.title)
+        .limit(limit)
+    )
+    return [title for title, in query.tuples()]
+
+
+station_search = _IndexedStationSearch()
+station_index.add_invalidation_hook(station_search.build)
@@ -0,0 +1,54 @@
+import threading
+from collections import OrderedDict
+
+from config_data.config import USER_REGISTRY_SIZE
+from database.database import User
+
+
+class UserRegistry:
+    """Зарегистрированные пользователи бота (таблица User) с кэшем идентификаторов в памяти.
+
+    Идентификаторы попадают в кэш при первом обращении к пользователю, поэтому повторные команды
+    не обращаются к БД, а новый пользователь записывается одним INSERT OR IGNORE. В памяти хранится
+    не больше max_size недавно активных пользователей.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._known: "OrderedDict[int, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _is_known(self, user_id: int) -> bool:
+        with self._lock:
+            if user_id in self._known:
+                self._known.move_to_end(user_id)
+                return True
+        return False
+
+    def _remember(self, user_id: int) -> None:
+        with self._lock:
+            self._known[user_id] = None
+            self._known.move_to_end(user_id)
+            while len(self._known) > self.max_size:
+                self._known.popitem(last=False)
+
+    def register(self, user_id: int) -> None:
+        """Регистрирует пользователя, если он еще не зарегистрирован"""
+        if self._is_known(user_id):
+            return
+
+        User.insert(id=user_id).on_conflict_ignore().execute()
+        self._remember(user_id)
+
+    def is_registered(self, user_id: int) -> bool:
+        if self._is_known(user_id):
+            return True
+
+        if User.get_or_none(User.id == user_id) is None:
+            return False
+
+        self._remember(user_id)
+        return True
+
+
+user_registry = UserRegistry(max_size=USER_REGISTRY_SIZE)
@@ -1,2 +1 @@
-from . import custom_handlers
 from . import default_handlers
@@ -0,0 +1,3 @@
+from . import commands
+from . import with_states
+from . import without_states
@@ -0,0 +1,69 @@
+import asyncio
+
+from telebot.types import Message
+from telebot.util import extract_command
+
+from async_loader import bot
+from config_data.config import HISTORY_SIZE
+from database.history_writer import history_writer
+from database.user_registry import user_registry
+from handlers import dialogs
+from handlers.async_handlers.reply import send_reply
+
+
+@bot.message_handler(commands=["start"])
+async def handle_start(message: Message):
+    """
+    Обработчик нажатия кнопки "START" (команды /start) при первом запуске бота: ничего не происходит
+    """
+    pass
+
+
+@bot.message_handler(commands=["hello_world"])
+async def bot_hello(message: Message) -> None:
+    """
+    Обработчик команды /hello_world. Выводит приветствие и базовую информацию о боте
+    """
+    # регистрируем пользователя при первом знакомстве с ботом
+    await asyncio.to_thread(user_registry.register, message.from_user.id)
+
+    await bot.send_message(chat_id=message.chat.id, text=dialogs.hello_text(message.from_user.first_name))
+
+
+@bot.message_handler(commands=["help"])
+async def bot_help(message: Message) -> None:
+    """
+    Обработчик команды /help. Выводит справку по доступным командам
+    """
+    await bot.send_message(chat_id=message.chat.id, text=dialogs.help_text())
+
+
+@bot.message_handler(commands=["routes_between", "route_stations"])
+async def start_search(message: Message) -> None:
+    """
+    Обработчик команд /routes_between и /route_stations. Запрашивает пункт отправления
+    """
+    user_id = message.from_user.id
+    chat_id = message.chat.id
+
+    # регистрируем пользователя при первом использовании команды, чтобы можно было сохранять историю поиска
+    await asyncio.to_thread(user_registry.register, user_id)
+
+    # сохраняем во временном хранилище тип запроса, чтобы потом использовать это в логике следующих шагов диалога
+    async with bot.retrieve_data(user_id=user_id, chat_id=chat_id) as data:
+        reply = dialogs.start_search(data, extract_command(message.text))
+
+    await send_reply(chat_id, user_id, reply)
+
+
+@bot.message_handler(commands=["history"])
+async def show_history(message: Message):
+    """
+    Обработчик команды /history. Выводит информацию об истории запросов текущего пользователя
+    """
+    user_id = message.from_user.id
+    registered = await asyncio.to_thread(user_registry.is_registered, user_id)
+
+    # последние запросы хранятся в памяти в готовом виде (вместе с еще не записанными в БД)
+    history_list = await asyncio.to_thread(history_writer.recent, user_id, limit=HISTORY_SIZE) if registered else []
+    await send_reply(message.chat.id, user_id, dialogs.history_reply(registered, history_list))
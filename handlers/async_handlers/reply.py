@@ -0,0 +1,16 @@
+from async_loader import bot
+from handlers.dialogs import FINISH, Reply
+from states.user_states import AsyncUserStates
+
+
+async def send_reply(chat_id: int, user_id: int, reply: Reply | None) -> None:
+    """Отправляет ответ пользователю и переводит диалог в состояние из ответа"""
+    if reply is None:
+        return
+
+    await bot.send_message(chat_id=chat_id, text=reply.text, reply_markup=reply.reply_markup)
+
+    if reply.state == FINISH:
+        await bot.delete_state(user_id=user_id, chat_id=chat_id)
+    elif reply.state is not None:
+        await bot.set_state(user_id=user_id, state=getattr(AsyncUserStates, reply.state), chat_id=chat_id)
@@ -0,0 +1,158 @@
+import asyncio
+
+from telebot.types import Message, CallbackQuery
+
+from api.async_core import route_stations_text, search_routes_between
+from async_loader import bot
+from database.history_writer import history_writer
+from handlers import dialogs
+from handlers.async_handlers.reply import send_reply
+from states.user_states import AsyncUserStates
+
+
+@bot.message_handler(state=AsyncUserStates.input_departure_station)
+async def get_departure_station(message: Message) -> None:
+    """
+    Обработчик пункта отправления. В случае успеха запрашивает пункт прибытия.
+    Поиск похожих названий до построения индекса обращается к БД, поэтому выполняется в пуле потоков
+    """
+    async with bot.retrieve_data(user_id=message.from_user.id, chat_id=message.chat.id) as data:
+        reply = await asyncio.to_thread(dialogs.station_entered, data, "departure_station", message.text)
+
+    await send_reply(message.chat.id, message.from_user.id, reply)
+
+
+@bot.message_handler(state=AsyncUserStates.input_arrival_station)
+async def get_arrival_station(message: Message) -> None:
+    """
+    Обработчик пункта прибытия. В случае успеха запрашивает дату
+    """
+    async with bot.retrieve_data(user_id=message.from_user.id, chat_id=message.chat.id) as data:
+        reply = await asyncio.to_thread(dialogs.station_entered, data, "arrival_station", message.text)
+
+    await send_reply(message.chat.id, message.from_user.id, reply)
+
+
+@bot.callback_query_handler(
+    func=lambda callback_query: callback_query.data.startswith("station_"),
+)
+async def choose_suggested_station(callback_query: CallbackQuery) -> None:
+    """
+    Обработчик выбора пункта отправления/прибытия из предложенных похожих названий.
+    После нажатия кнопки клавиатура исчезает, а бот продолжает сценарий так же, как при вводе названия.
+    Нажатие кнопки устаревших подсказок (в том числе вне ввода пунктов) только сообщает об этом
+    """
+    user_id = callback_query.from_user.id
+    chat_id = callback_query.message.chat.id
+    field = dialogs.station_field(await bot.get_state(user_id=user_id, chat_id=chat_id))
+
+    title = None
+    if field is not None:
+        async with bot.retrieve_data(user_id=user_id, chat_id=chat_id) as data:
+            title = dialogs.suggested_station(data, callback_query.data)
+            reply = dialogs.accept_station(data, field, title) if title else None
+
+    if title is None:
+        await bot.answer_callback_query(callback_query.id, text=dialogs.STALE_SUGGESTIONS)
+        return
+
+    await bot.answer_callback_query(callback_query.id)
+    await bot.edit_message_text(
+        text=dialogs.station_choice_text(title),
+        chat_id=chat_id,
+        message_id=callback_query.message.message_id,
+    )
+
+    await send_reply(chat_id, user_id, reply)
+
+
+@bot.message_handler(state=AsyncUserStates.input_date)
+async def get_date(message: Message) -> None:
+    """
+    Обработчик даты. В случае успеха запрашивает тип транспорта и выводит инлайн-клавиатуру
+    """
+    async with bot.retrieve_data(user_id=message.from_user.id, chat_id=message.chat.id) as data:
+        reply = dialogs.date_entered(data, message.text)
+
+    await send_reply(message.chat.id, message.from_user.id, reply)
+
+
+@bot.callback_query_handler(
+    func=lambda callback_query: callback_query.data
+    in ["bus", "plane", "train", "suburban"]
+)
+async def get_transport_type(callback_query: CallbackQuery) -> None:
+    """
+    Обработчик типа транспорта. Ввод осуществляется с помощью инлайн-клавиатуры.
+    После нажатия одной из кнопок клавиатура исчезает, а бот информирует о сделанном выборе.
+    Далее для сценария /routes_between выводится резюме запроса и результат поиска,
+    для сценария /route_stations - список маршрутов
+    """
+    # обрабатываем нажатие кнопки и запоминаем выбор пользователя
+    await bot.answer_callback_query(callback_query.id)
+
+    user_id = callback_query.from_user.id
+    chat_id = callback_query.message.chat.id
+
+    async with bot.retrieve_data(user_id=user_id, chat_id=chat_id) as data:
+        request = dialogs.search_request(data, callback_query.data)
+
+    await bot.edit_message_text(
+        text=dialogs.transport_choice_text(callback_query.data),
+        chat_id=chat_id,
+        message_id=callback_query.message.message_id,
+    )
+    if request is None:
+        return
+
+    # запрос попадает в историю поиска в фоне, не задерживая ответ пользователю
+    await asyncio.to_thread(history_writer.add, user=user_id, **request.history)
+
+    # резюмируем введенные данные и выводим результаты запроса
+    await send_reply(chat_id, user_id, request.summary)
+    result = await search_routes_between(**request.params)
+
+    async with bot.retrieve_data(user_id=user_id, chat_id=chat_id) as data:
+        reply = await asyncio.to_thread(dialogs.search_result, data, request, result)
+
+    await send_reply(chat_id, user_id, reply)
+
+
+@bot.callback_query_handler(
+    func=lambda callback_query: callback_query.data.startswith("page_"),
+)
+async def handle_pagination(callback_query: CallbackQuery) -> None:
+    """Обработчик пагинации при просмотре результатов.
+    Страницы берутся из общего хранилища результатов по идентификатору из кнопки, поэтому листать можно
+    любое недавнее сообщение с результатами, независимо от текущего состояния диалога
+    """
+    page = await asyncio.to_thread(dialogs.page, callback_query.data)
+    if page is None:
+        await bot.answer_callback_query(callback_query.id, text="Результаты поиска устарели. Повторите запрос")
+        return
+
+    await bot.answer_callback_query(callback_query.id)
+    text, keyboard = page
+
+    await bot.edit_message_text(
+        text=text,
+        chat_id=callback_query.message.chat.id,
+        message_id=callback_query.message.message_id,
+        reply_markup=keyboard,
+    )
+
+
+@bot.message_handler(state=AsyncUserStates.viewing_result, content_types=["text"])
+async def get_thread(message: Message) -> None:
+    """
+    Обработчик выбранного маршрута для сценария /route_stations. В случае успеха выводит станции следования
+    """
+    async with bot.retrieve_data(user_id=message.from_user.id, chat_id=message.chat.id) as data:
+        thread_uid = dialogs.chosen_thread(data, message.text)
+
+    if thread_uid is None:
+        await send_reply(message.chat.id, message.from_user.id, dialogs.INPUT_ERROR)
+        return
+
+    text = await route_stations_text(thread_uid)
+    await send_reply(message.chat.id, message.from_user.id, dialogs.route_stations_reply(text))
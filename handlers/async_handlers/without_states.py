@@ -0,0 +1,17 @@
+from telebot.types import Message
+
+from async_loader import bot
+from handlers import dialogs
+
+
+@bot.message_handler(state=None)
+async def reply_to_text(message: Message) -> None:
+    """
+    Обработчик текстовых сообщений без указанного состояния.
+    В ответ на "Привет" также приветствует пользователя; в остальных случаях - выводит текстовое сообщение о том,
+    что команда боту не знакома и советует обратиться к справке, а также случайный занимательный факт о транспорте.
+    """
+    await bot.send_message(
+        chat_id=message.chat.id,
+        text=dialogs.text_reply(message.text, message.from_user.first_name),
+    )
@@ -1,10 +1,12 @@
-from peewee import IntegrityError
 from telebot.types import Message
+from telebot.util import extract_command
 
-from config_data.config import DEFAULT_COMMANDS
-from database.database import User, Search
-from loader import bot
-from states.user_states import UserStates
+from config_data.config import HISTORY_SIZE
+from database.history_writer import history_writer
+from database.user_registry import user_registry
+from handlers import dialogs
+from handlers.default_handlers.reply import send_reply
+from loader import bot, sender
 
 
 @bot.message_handler(commands=["start"])
@@ -21,18 +23,9 @@ def bot_hello(message: Message) -> None:
     Обработчик команды /hello_world. Выводит приветствие и базовую информацию о боте
     """
     # регистрируем пользователя при первом знакомстве с ботом
-    try:
-        User.create(id=message.from_user.id)
-    except IntegrityError:
-        pass
+    user_registry.register(message.from_user.id)
 
-    bot.send_message(
-        chat_id=message.chat.id,
-        text=f"Привет, {message.from_user.first_name}👋!\nЯ бот Человечище, который поможет получить информацию "
-        f"о маршрутах и конкретных рейсах (работаю на основе API Яндекс Расписаний). "
-        f"Надеюсь, эта информацию будет полезна и позволит спланировать отпуск, командировку, "
-        f"поездку и т.п.\nХорошего поиска!🔍",
-    )
+    sender.send_message(chat_id=message.chat.id, text=dialogs.hello_text(message.from_user.first_name))
 
 
 @bot.message_handler(commands=["help"])
@@ -40,82 +33,25 @@ def bot_help(message: Message) -> None:
     """
     Обработчик команды /help. Выводит справку по доступным командам
     """
-    header = "Доступные команды:\n"
-    text = [f"/{command} - {desk}" for command, desk in DEFAULT_COMMANDS]
-    full_text = header + "\n".join(text)
+    sender.send_message(chat_id=message.chat.id, text=dialogs.help_text())
 
-    link_to_stations_list = 'https://disk.yandex.ru/d/Cbw6LTCoitLpFQ'
-    full_text += f'\n\nНазвания пунктов вводятся на русском языке. Справочник станций: {link_to_stations_list}'
 
-    bot.send_message(chat_id=message.chat.id, text=full_text)
-
-
-@bot.message_handler(commands=["routes_between"])
-def start_routes_between(message: Message) -> None:
+@bot.message_handler(commands=["routes_between", "route_stations"])
+def start_search(message: Message) -> None:
     """
-    Обработчик команды /routes_between. Запрашивает пункт отправления
+    Обработчик команд /routes_between и /route_stations. Запрашивает пункт отправления
     """
-    # регистрируем пользователя при первом использовании команды, чтобы можно было сохранять историю поиска
-    try:
-        User.create(id=message.from_user.id)
-    except IntegrityError:
-        pass
-
     user_id = message.from_user.id
     chat_id = message.chat.id
 
-    # сохраняем во временном хранилище тип запроса, чтобы потом использовать это в логике хэндлера get_transport_type
-    with bot.retrieve_data(user_id=user_id, chat_id=chat_id) as data:
-        data["search_type"] = "routes_between"
-
-    bot.send_message(
-        chat_id=chat_id,
-        text="Для получения информации о рейсах вам необходимо будет ввести последовательно пункт отправления, "
-        "пункт прибытия, дату и тип транспорта.\n\nВведите пункт отправления (станция/вокзал/аэропорт и т.п.)",
-    )
-
-    bot.set_state(
-        user_id=user_id,
-        state=UserStates.input_departure_station,
-        chat_id=chat_id,
-    )
-
-
-@bot.message_handler(commands=["route_stations"])
-def start_route_stations(message: Message):
-    """
-    Обработчик команды /route_stations. Запрашивает пункт отправления
-    """
     # регистрируем пользователя при первом использовании команды, чтобы можно было сохранять историю поиска
-    user_id = message.from_user.id
-    chat_id = message.chat.id
+    user_registry.register(user_id)
+
+    # сохраняем во временном хранилище тип запроса, чтобы потом использовать это в логике следующих шагов диалога
+    with bot.retrieve_data(user_id=user_id, chat_id=chat_id) as data:
+        reply = dialogs.start_search(data, extract_command(message.text))
 
-    try:
-        User.create(id=user_id)
-    except IntegrityError:
-        pass
-
-    # сохраняем во временном хранилище тип запроса, чтобы потом использовать это в логике хэндлеров
-    # get_arrival_station и get_transport_type
-    try:
-        with bot.retrieve_data(user_id=user_id, chat_id=chat_id) as data:
-            data["search_type"] = "route_stations"
-    except Exception:
-        with bot.retrieve_data(user_id=user_id, chat_id=chat_id) as data:
-            data["search_type"] = "route_stations"
-
-    bot.send_message(
-        chat_id=chat_id,
-        text="Для получения информации о пунктах следования вам необходимо будет ввести последовательно пункт "
-        "отправления, пункт прибытия, дату и тип транспорта, после чего выбрать маршрут из списка.\n\n"
-        "Введите пункт отправления (станция/вокзал/аэропорт и т.п.)",
-    )
-
-    bot.set_state(
-        user_id=user_id,
-        state=UserStates.input_departure_station,
-        chat_id=chat_id,
-    )
+    send_reply(chat_id, user_id, reply)
 
 
 @bot.message_handler(commands=["history"])
@@ -124,27 +60,8 @@ def show_history(message: Message):
     Обработчик команды /history. Выводит информацию об истории запросов текущего пользователя
     """
     user_id = message.from_user.id
-    chat_id = message.chat.id
+    registered = user_registry.is_registered(user_id)
 
-    user = User.get_or_none(User.id == user_id)
-    if user is None:
-        bot.send_message(
-            chat_id=chat_id,
-            text="Вы не зарегистрированы. Познакомьтесь с ботом, чтобы зарегистрироваться (команда /hello_world)",
-        )
-        return
-
-    history_list = user.history.order_by(Search.search_id.desc()).limit(10)
-    if not history_list:
-        bot.send_message(
-            chat_id=chat_id,
-            text="В базе данных нет записей о Ваших запросах",
-        )
-
-    else:
-        text = (
-            "📋История поиска (последние 10 запросов, от свежих к менее свежим):\n\n"
-            + ("\n".join(str(search) for search in history_list))
-        )
-        bot.send_message(chat_id=chat_id, text=text)
-        bot.delete_state(user_id=user_id, chat_id=chat_id)
+    # последние запросы хранятся в памяти в готовом виде (вместе с еще не записанными в БД)
+    history_list = history_writer.recent(user_id, limit=HISTORY_SIZE) if registered else []
+    send_reply(message.chat.id, user_id, dialogs.history_reply(registered, history_list))
@@ -0,0 +1,16 @@
+from handlers.dialogs import FINISH, Reply
+from loader import bot, sender
+from states.user_states import UserStates
+
+
+def send_reply(chat_id: int, user_id: int, reply: Reply | None) -> None:
+    """Отправляет ответ пользователю и переводит диалог в состояние из ответа"""
+    if reply is None:
+        return
+
+    sender.send_message(chat_id=chat_id, text=reply.text, reply_markup=reply.reply_markup)
+
+    if reply.state == FINISH:
+        bot.delete_state(user_id=user_id, chat_id=chat_id)
+    elif reply.state is not None:
+        bot.set_state(user_id=user_id, state=getattr(UserStates, reply.state), chat_id=chat_id)
@@ -0,0 +1,376 @@
+"""Логика диалогов бота, общая для синхронных (handlers/default_handlers) и асинхронных
+(handlers/async_handlers) обработчиков.
+
+Функции модуля получают данные диалога (словарь из bot.retrieve_data) и ввод пользователя, изменяют данные
+и возвращают ответ (Reply), а обработчики только отправляют его и переводят диалог в новое состояние.
+Функции, которые обращаются к БД (search_result, page), асинхронные обработчики вызывают в пуле потоков.
+"""
+import secrets
+from typing import Dict, List, NamedTuple, Tuple
+
+from telebot.types import InlineKeyboardMarkup
+
+from api.core import format_pages, format_pages_threads, format_segments, format_threads, normalize_segments
+from config_data.config import DEFAULT_COMMANDS, HISTORY_SIZE, STATION_SUGGESTIONS_LIMIT
+from database.result_store import result_store
+from database.station_index import station_index
+from database.station_search import station_search
+from keyboards.inline.pagination_keyboard import get_pagination_keyboard
+from keyboards.inline.station_suggestions import station_suggestions_markup
+from keyboards.inline.transport_types import transport_types_markup
+from utils.utils import check_date, convert_date, get_threads, get_transport_fact, transport_names
+
+# состояние ответа, после которого диалог завершается (состояние пользователя удаляется)
+FINISH = "finish"
+
+# поле данных диалога для пункта, который пользователь вводит в каждом из состояний
+STATION_FIELDS = {
+    "input_departure_station": "departure_station",
+    "input_arrival_station": "arrival_station",
+}
+
+
+class Reply(NamedTuple):
+    """Ответ пользователю
+    Attrs:
+        text: текст сообщения
+        reply_markup: инлайн-клавиатура сообщения
+        state: имя состояния (атрибута UserStates/AsyncUserStates), в которое диалог переходит после ответа;
+            FINISH - диалог завершается, None - состояние не меняется
+    """
+
+    text: str
+    reply_markup: InlineKeyboardMarkup | None = None
+    state: str | None = None
+
+
+class SearchRequest(NamedTuple):
+    """Поиск, собранный из данных диалога после выбора вида транспорта
+    Attrs:
+        history: поля записи в истории поиска (кроме пользователя)
+        params: параметры search_routes_between
+        key: параметры поиска для хранилища результатов result_store
+        summary: резюме запроса для пользователя
+    """
+
+    history: Dict
+    params: Dict
+    key: str
+    summary: Reply
+
+
+INPUT_ERROR = Reply("Ошибка ввода. Попробуйте снова")
+
+REQUEST_ERROR = Reply(
+    "Ошибка запроса - скорее всего, вы указали город пунктом отправления, а сервис требует "
+    "указывать станции, вокзалы, остановки и т.п. - например, Москва (Казанский вокзал) вместо Москва",
+    state=FINISH,
+)
+
+API_ERROR = Reply("Ошибка запроса к API. Попробуйте повторить запрос позже", state=FINISH)
+
+# ответ на нажатие кнопки подсказок, которые уже выбраны, заменены новыми или нажаты вне ввода пунктов
+STALE_SUGGESTIONS = "Эти варианты устарели"
+
+START_TEXTS = {
+    "routes_between": "Для получения информации о рейсах вам необходимо будет ввести последовательно пункт "
+    "отправления, пункт прибытия, дату и тип транспорта.\n\nВведите пункт отправления (станция/вокзал/аэропорт и т.п.)",
+    "route_stations": "Для получения информации о пунктах следования вам необходимо будет ввести последовательно пункт "
+    "отправления, пункт прибытия, дату и тип транспорта, после чего выбрать маршрут из списка.\n\n"
+    "Введите пункт отправления (станция/вокзал/аэропорт и т.п.)",
+}
+
+
+def hello_text(first_name: str) -> str:
+    return (
+        f"Привет, {first_name}👋!\nЯ бот Человечище, который поможет получить информацию "
+        f"о маршрутах и конкретных рейсах (работаю на основе API Яндекс Расписаний). "
+        f"Надеюсь, эта информацию будет полезна и позволит спланировать отпуск, командировку, "
+        f"поездку и т.п.\nХорошего поиска!🔍"
+    )
+
+
+def help_text() -> str:
+    header = "Доступные команды:\n"
+    text = [f"/{command} - {desk}" for command, desk in DEFAULT_COMMANDS]
+    full_text = header + "\n".join(text)
+
+    link_to_stations_list = 'https://disk.yandex.ru/d/Cbw6LTCoitLpFQ'
+    full_text += f'\n\nНазвания пунктов вводятся на русском языке. Справочник станций: {link_to_stations_list}'
+    return full_text
+
+
+def text_reply(text: str, first_name: str) -> str:
+    """Ответ на текстовое сообщение вне диалога: приветствие или совет обратиться к справке"""
+    if text.lower() == "привет":
+        return f"Рад видеть вас, {first_name}!"
+
+    random_fact = get_transport_fact()
+    if text.startswith("/") and text not in DEFAULT_COMMANDS:
+        return (
+            "Я пока не знаю такую команду 🙄 Список доступных команд можно получить с помощью /help\n\n"
+            f"Чтобы реабилитироваться в ваших глазах, приведу занимательный факт о транспорте. Вы знали, что {random_fact}?"
+        )
+
+    return (
+        "Я пока не обучен отвечать на текстовые сообщения пользователя 🥲 Список доступных команд можно получить с помощью /help\n\n"
+        f"Чтобы реабилитироваться в ваших глазах, приведу занимательный факт о транспорте. Вы знали, что {random_fact}?"
+    )
+
+
+def start_search(data: Dict, search_type: str) -> Reply:
+    """Начинает диалог /routes_between или /route_stations: запрашивает пункт отправления"""
+    # тип запроса определяет дальнейшие шаги диалога (accept_station, search_request)
+    data["search_type"] = search_type
+    return Reply(START_TEXTS[search_type], state="input_departure_station")
+
+
+def history_reply(registered: bool, history_list: List[str]) -> Reply:
+    """Ответ на /history: последние запросы пользователя"""
+    if not registered:
+        return Reply("Вы не зарегистрированы. Познакомьтесь с ботом, чтобы зарегистрироваться (команда /hello_world)")
+
+    if not history_list:
+        return Reply("В базе данных нет записей о Ваших запросах")
+
+    return Reply(
+        f"📋История поиска (последние {HISTORY_SIZE} запросов, от свежих к менее свежим):\n\n"
+        + ("\n".join(history_list)),
+        state=FINISH,
+    )
+
+
+def station_field(state: str | None) -> str | None:
+    """Поле данных диалога для пункта, который вводится в состоянии state (None - пункт сейчас не вводится)"""
+    # имя состояния telebot - "Группа:состояние"
+    return STATION_FIELDS.get(state.rsplit(":", 1)[-1]) if state else None
+
+
+def station_entered(data: Dict, field: str, text: str) -> Reply | None:
+    """Введенный пункт отправления/прибытия: принимает его или предлагает похожие названия"""
+    # проверяем наличие введенного пункта в справочнике станций
+    if text in station_index:
+        return accept_station(data, field, text)
+    return suggest_stations(data, text)
+
+
+def suggest_stations(data: Dict, text: str) -> Reply:
+    """Сообщает, что введенного пункта нет в справочнике, и предлагает похожие названия (если они есть)"""
+    suggestions = station_search.search(text, STATION_SUGGESTIONS_LIMIT)
+    if not suggestions:
+        return Reply(
+            "Проверьте правильность введённого названия и попробуйте снова. Если же ввод правильный, "
+            "то такого пункта нет в моём справочнике и получить информацию о рейсах не удастся."
+        )
+
+    # запоминаем предложенные названия, чтобы по нажатию кнопки получить выбранное, и идентификатор
+    # подсказок, чтобы отличить их кнопки от кнопок прежних подсказок
+    suggestions_id = secrets.token_hex(4)
+    data["station_suggestions"] = suggestions
+    data["station_suggestions_id"] = suggestions_id
+    return Reply(
+        "Такого пункта нет в моём справочнике. Возможно, вы имели в виду один из этих пунктов? "
+        "Выберите его или введите название снова",
+        reply_markup=station_suggestions_markup(suggestions, suggestions_id),
+    )
+
+
+def suggested_station(data: Dict, callback_data: str) -> str | None:
+    """Название, выбранное кнопкой из последних предложенных suggest_stations (None - подсказки устарели)"""
+    # callback_data кнопки: station_{идентификатор_подсказок}_{номер_названия}
+    parts = callback_data.split("_")
+    if len(parts) != 3 or parts[1] != data.get("station_suggestions_id") or not parts[2].isdigit():
+        return None
+
+    index = int(parts[2])
+    suggestions = data.get("station_suggestions") or []
+    if index >= len(suggestions) or suggestions[index] not in station_index:
+        return None
+    return suggestions[index]
+
+
+def station_choice_text(title: str) -> str:
+    return f"Вы выбрали пункт: {title}"
+
+
+def accept_station(data: Dict, field: str, title: str) -> Reply | None:
+    """Запоминает пункт отправления/прибытия и запрашивает следующий шаг диалога: пункт прибытия,
+    дату (для /routes_between) или вид транспорта (для /route_stations)
+    """
+    data[field] = title
+    # подсказки к этому пункту больше не нужны, и их кнопки не должны изменить следующий пункт
+    data.pop("station_suggestions", None)
+    data.pop("station_suggestions_id", None)
+
+    if field == "departure_station":
+        return Reply(
+            "Отлично! Введите пункт прибытия (станция/вокзал/аэропорт и т.п.)",
+            state="input_arrival_station",
+        )
+
+    search_type = data.get("search_type")
+    if search_type == "routes_between":
+        return Reply(
+            "Принято! Введите дату в формате ДД.ММ.ГГГГ (сервис работает для текущей и будущих дат "
+            "в рамках 2026 года)",
+            state="input_date",
+        )
+
+    if search_type == "route_stations":
+        return Reply(
+            "Принято! Введите вид транспорта",
+            reply_markup=transport_types_markup(),
+            state="input_transport_type",
+        )
+
+    return None
+
+
+def date_entered(data: Dict, text: str) -> Reply:
+    """Введенная дата: в случае успеха запрашивает тип транспорта"""
+    if not check_date(text):  # проверяем правильность введенной даты
+        return Reply(
+            "Проверьте правильность введённой даты и попробуйте снова. Если же ввод правильный, "
+            "то по независящим от меня причинам получить информацию о рейсах не удастся."
+        )
+
+    data["date"] = convert_date(text)
+    return Reply(
+        "Запомнил! Введите тип транспорта",
+        reply_markup=transport_types_markup(),
+        state="input_transport_type",
+    )
+
+
+def transport_choice_text(transport: str) -> str:
+    return f"Вы выбрали тип транспорта: {transport_names[transport]}"
+
+
+def search_request(data: Dict, transport: str) -> SearchRequest | None:
+    """Запоминает выбранный вид транспорта и собирает поиск из введенных ранее данных диалога
+
+    :return: поиск; None, если тип запроса неизвестен
+    """
+    data["transport_type"] = transport
+    search_type = data.get("search_type")
+    from_station = data.get("departure_station")
+    to_station = data.get("arrival_station")
+    date = data.get("date")
+    params = dict(
+        search_type=search_type,
+        from_station=from_station,
+        to_station=to_station,
+        transport_types=transport,
+    )
+
+    # в зависимости от типа запроса, реализуем различную логику
+    # ВЕТКА ДЛЯ СЦЕНАРИЯ /routes_between
+    if search_type == "routes_between":
+        return SearchRequest(
+            history=dict(
+                search_type=search_type,
+                departure_station=from_station,
+                arrival_station=to_station,
+                date=date,
+                transport=transport_names[transport],
+            ),
+            params={**params, "date": date},
+            key=f"routes_between:{transport}:{from_station}:{to_station}:{date}",
+            summary=Reply(
+                'Ищу рейсы по запросу "{trans} {from_station}-{to_station} на {date}"...'.format(
+                    trans=transport_names[transport],
+                    from_station=from_station,
+                    to_station=to_station,
+                    date=date,
+                )
+            ),
+        )
+
+    # ВЕТКА ДЛЯ СЦЕНАРИЯ /route_stations
+    if search_type == "route_stations":
+        return SearchRequest(
+            history=dict(
+                search_type=search_type,
+                departure_station=from_station,
+                arrival_station=to_station,
+                transport=transport_names[transport],
+            ),
+            params=params,
+            key=f"route_stations:{transport}:{from_station}:{to_station}",
+            summary=Reply(
+                'Ищу маршруты по запросу "{trans} {from_station}-{to_station}"...'.format(
+                    trans=transport_names[transport],
+                    from_station=from_station,
+                    to_station=to_station,
+                )
+            ),
+        )
+
+    return None
+
+
+def search_result(data: Dict, request: SearchRequest, result: Dict | None) -> Reply:
+    """Результат поиска: сообщение с результатом или его первой страницей и клавиатурой пагинации.
+
+    Результат, который требует пагинации, сохраняется в общее хранилище результатов (обращается к БД)
+    """
+    # если запрос к API не успешен, то сообщаем об этом пользователю
+    if not result:
+        return REQUEST_ERROR
+
+    if request.params["search_type"] == "routes_between":
+        # выводим результат поиска, если он не требует пагинации
+        segments = normalize_segments(result.get("segments"))
+        if len(segments) < 6:
+            return Reply(format_segments(segments), state=FINISH)
+
+        # сохраняем готовые страницы результата в общее хранилище и выводим первую страницу с клавиатурой
+        pages = format_pages(segments)
+        rid = result_store.put(request.key, pages)
+        return Reply(pages[0], reply_markup=get_pagination_keyboard(rid, 1, len(pages)), state=FINISH)
+
+    # получаем маршруты и запоминаем их идентификаторы для выбора маршрута по номеру
+    threads = get_threads(result.get("segments"))
+    data["thread_uids"] = [thread.uid for thread in threads]
+
+    if len(threads) < 6:
+        return Reply(format_threads(threads), state="viewing_result")
+
+    pages = format_pages_threads(threads)
+    rid = result_store.put(request.key, pages)
+    return Reply(pages[0], reply_markup=get_pagination_keyboard(rid, 1, len(pages)), state="viewing_result")
+
+
+def page(callback_data: str) -> Tuple[str, InlineKeyboardMarkup] | None:
+    """Страница результата по callback_data кнопки пагинации (обращается к БД)
+
+    :return: (текст страницы, клавиатура); None, если результат устарел
+    """
+    # callback_data кнопки: page_{идентификатор_результата}_{номер_страницы}
+    parts = callback_data.split("_")
+    pages = result_store.get(parts[1]) if len(parts) == 3 and parts[2].isdigit() else None
+    number = int(parts[2]) if pages else 0
+
+    if number < 1 or number > len(pages):
+        return None
+    return pages[number - 1], get_pagination_keyboard(parts[1], number, len(pages))
+
+
+def chosen_thread(data: Dict, text: str) -> str | None:
+    """Идентификатор маршрута, выбранного по номеру в списке (None - номер введен неправильно)"""
+    thread_uids = data.get("thread_uids") or []
+    try:
+        thread_order_number = int(text)
+    except ValueError:
+        return None
+
+    if thread_order_number < 1 or thread_order_number > len(thread_uids):
+        return None
+    return thread_uids[thread_order_number - 1]
+
+
+def route_stations_reply(text: str | None) -> Reply:
+    """Станции следования выбранного маршрута (text - None, если запрос к API не удался)"""
+    if not text:
+        return API_ERROR
+    return Reply(text, state=FINISH)
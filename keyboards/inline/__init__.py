@@ -1,2 +1,3 @@
 from . import transport_types
 from . import pagination_keyboard
+from . import station_suggestions
\ No newline at end of file
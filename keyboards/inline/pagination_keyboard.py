@@ -1,15 +1,17 @@
 from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup
 
 
-def get_pagination_keyboard(page: int, total_pages: int) -> InlineKeyboardMarkup:
+def get_pagination_keyboard(result_id: str, page: int, total_pages: int) -> InlineKeyboardMarkup:
     """Создание клавиатуры для пагинации, состоящей из трех кнопок:
     {предыдущая страница} {номер_страницы / всего страниц} {следующая страница}
+
+    Кнопки перехода содержат идентификатор результата поиска: page_{идентификатор}_{номер_страницы}
     """
     row = [InlineKeyboardButton(f"{page}/{total_pages}", callback_data="ignore")]
 
     if page > 1:
-        row.insert(0, InlineKeyboardButton("◀️", callback_data=f"page_{page - 1}"))
+        row.insert(0, InlineKeyboardButton("◀️", callback_data=f"page_{result_id}_{page - 1}"))
     if page < total_pages:
-        row.append(InlineKeyboardButton("▶️", callback_data=f"page_{page + 1}"))
+        row.append(InlineKeyboardButton("▶️", callback_data=f"page_{result_id}_{page + 1}"))
 
     return InlineKeyboardMarkup([row])
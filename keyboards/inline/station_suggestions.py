@@ -0,0 +1,17 @@
+from typing import List
+
+from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+
+def station_suggestions_markup(titles: List[str], suggestions_id: str) -> InlineKeyboardMarkup:
+    """
+    Создаёт инлайн-клавиатуру с похожими названиями пунктов (по одному в строке).
+    В callback_data передается порядковый номер названия, т.к. само название может не поместиться в 64 байта,
+    и идентификатор списка подсказок, чтобы не принимать нажатия кнопок прежних подсказок:
+    station_{идентификатор_подсказок}_{номер_названия}
+    """
+    keyboard = InlineKeyboardMarkup()
+    for index, title in enumerate(titles):
+        keyboard.add(InlineKeyboardButton(text=title, callback_data=f"station_{suggestions_id}_{index}"))
+
+    return keyboard
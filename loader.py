@@ -1,8 +1,30 @@
-from telebot import TeleBot
-from telebot.storage import StateMemoryStorage
-
 from config_data import config
+from database.database import db
+from states.storage import SQLiteStateStorage
+from utils.dispatcher import OrderedTeleBot
+from utils.sender import RateLimitedSender
+
+storage = SQLiteStateStorage(
+    ttl=config.STATE_TTL,
+    cache_size=config.STATE_CACHE_SIZE,
+    max_bytes=config.STATE_MAX_BYTES,
+)
+bot = OrderedTeleBot(
+    token=config.BOT_TOKEN,
+    state_storage=storage,
+    workers=config.UPDATE_WORKERS,
+    queue_size=config.UPDATE_QUEUE_SIZE,
+    # у каждого потока-обработчика свое соединение с БД на все время работы
+    thread_context=db.connection_context,
+)
 
-storage = StateMemoryStorage()
-bot = TeleBot(token=config.BOT_TOKEN, state_storage=storage)
+# сообщения пользователям отправляются через очередь с ограничением частоты запросов к Telegram
+sender = RateLimitedSender(
+    bot,
+    global_rate=config.SEND_GLOBAL_RATE,
+    chat_rate=config.SEND_CHAT_RATE,
+    chat_burst=config.SEND_CHAT_BURST,
+    workers=config.SEND_WORKERS,
+    max_retries=config.SEND_MAX_RETRIES,
+)
 
@@ -1,15 +1,30 @@
 from telebot.custom_filters import StateFilter
 
-from api.core import load_stations
+from api.core import boot_stations, refresh_stations_in_background
 from database.database import create_tables
-from loader import bot
+from database.history_writer import history_writer
+from loader import bot, sender
 import handlers  # noqa
 from utils.set_bot_commands import set_default_commands
 
 if __name__ == "__main__":
     create_tables()  # создаем БД
-    load_stations()  # загружаем станции из API Яндекс Расписаний
+    boot_stations()  # при пустой таблице станций заполняем ее из локального снимка
 
     bot.add_custom_filter(StateFilter(bot))
     set_default_commands(bot)
-    bot.infinity_polling()
+
+    # строим индекс поиска станций по неточному названию и обновляем станции из API Яндекс Расписаний
+    # (только изменения), пока бот уже отвечает пользователям
+    refresh_stations_in_background()
+
+    # обновления обрабатываются в UPDATE_WORKERS потоках: по порядку внутри чата, параллельно между чатами
+    history_writer.start()  # история поиска записывается в БД пачками в фоновом потоке
+    sender.start()  # сообщения отправляются с учетом ограничений Telegram на частоту
+    bot.dispatcher.start()
+    try:
+        bot.infinity_polling()
+    finally:
+        bot.dispatcher.stop()
+        sender.stop()  # отправляем сообщения, оставшиеся в очереди
+        history_writer.stop()  # дописываем историю поиска, оставшуюся в очереди
@@ -0,0 +1,35 @@
+import asyncio
+
+from telebot.asyncio_filters import StateFilter
+
+from api.async_core import close_session
+from api.core import boot_stations, refresh_stations_in_background
+from async_loader import bot
+from database.database import create_tables
+from database.history_writer import history_writer
+import handlers.async_handlers  # noqa
+from utils.set_bot_commands import set_default_commands_async
+
+
+async def main() -> None:
+    bot.add_custom_filter(StateFilter(bot))
+    await set_default_commands_async(bot)
+
+    # строим индекс поиска станций по неточному названию и обновляем станции из API Яндекс Расписаний
+    # (только изменения), пока бот уже отвечает пользователям
+    refresh_stations_in_background()
+    history_writer.start()  # история поиска записывается в БД пачками в фоновом потоке
+    try:
+        await bot.infinity_polling()
+    finally:
+        await close_session()
+        history_writer.stop()  # дописываем историю поиска, оставшуюся в очереди
+
+
+# асинхронный режим бота: обработчики из handlers/async_handlers выполняются в одном цикле событий asyncio,
+# поэтому ожидание ответа API не блокирует поток и одновременно могут выполняться тысячи поисков
+if __name__ == "__main__":
+    create_tables()  # создаем БД
+    boot_stations()  # при пустой таблице станций заполняем ее из локального снимка
+
+    asyncio.run(main())
@@ -0,0 +1,205 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from telebot import asyncio_storage
+from telebot.storage import StateContext, StateStorageBase
+
+from database.database import DialogState
+
+logger = logging.getLogger(__name__)
+
+# как часто (раз в сколько записей) из БД удаляются диалоги, неактивные дольше ttl
+PURGE_EVERY = 1000
+
+
+def _encode(data) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+class SQLiteStateStorage(StateStorageBase):
+    """Хранилище состояний пользователей в БД (таблица DialogState) вместо StateMemoryStorage.
+
+    Состояние и данные диалога сохраняются при каждом изменении, поэтому перезапуск бота не прерывает
+    начатые поиски. Недавно активные диалоги дополнительно хранятся в LRU-кэше в памяти (не больше
+    cache_size), а диалоги, неактивные дольше ttl секунд, считаются завершенными и удаляются.
+    Данные одного диалога ограничены max_bytes в JSON: из слишком больших данных удаляются самые
+    объемные ключи (начиная с наибольшего), пока данные не уложатся в лимит, и только такие данные
+    сохраняются в кэш и в БД. Обработчики считают отсутствующие ключи устаревшим вводом.
+    """
+
+    def __init__(self, ttl: int, cache_size: int, max_bytes: int) -> None:
+        super().__init__()
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.max_bytes = max_bytes
+
+        # {(chat_id, user_id): {"state": ..., "data": {...}, "updated_at": ...}}
+        self._cache: "OrderedDict[Tuple[int, int], Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _load(self, chat_id: int, user_id: int) -> Dict | None:
+        key = (chat_id, user_id)
+        expired_before = time.time() - self.ttl
+
+        with self._lock:
+            record = self._cache.get(key)
+            if record is not None:
+                if record["updated_at"] > expired_before:
+                    self._cache.move_to_end(key)
+                    return record
+                del self._cache[key]
+
+        row = DialogState.get_or_none((DialogState.chat_id == chat_id) & (DialogState.user_id == user_id))
+        if row is None or row.updated_at <= expired_before:
+            return None
+
+        record = {"state": row.state, "data": json.loads(row.data), "updated_at": row.updated_at}
+        self._remember(key, record)
+        return record
+
+    def _remember(self, key: Tuple[int, int], record: Dict) -> None:
+        with self._lock:
+            self._cache[key] = record
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _cap(self, chat_id: int, user_id: int, data: Dict) -> Tuple[Dict, str]:
+        """Данные диалога, уложенные в max_bytes, и их JSON. Из больших данных удаляются самые объемные ключи"""
+        encoded = _encode(data)
+        size = len(encoded.encode())
+        if size <= self.max_bytes:
+            return data, encoded
+
+        sizes = {key: len(_encode(value).encode()) for key, value in data.items()}
+        data = dict(data)
+        dropped = []
+        for key in sorted(sizes, key=sizes.get, reverse=True):
+            del data[key]
+            dropped.append(key)
+            encoded = _encode(data)
+            if len(encoded.encode()) <= self.max_bytes:
+                break
+
+        logger.warning(
+            "Данные диалога %s/%s (%d байт) превышают лимит, удалены ключи: %s",
+            chat_id,
+            user_id,
+            size,
+            ", ".join(map(str, dropped)),
+        )
+        return data, encoded
+
+    def _store(self, chat_id: int, user_id: int, state: str | None, data: Dict) -> None:
+        data, encoded = self._cap(chat_id, user_id, data)
+        record = {"state": state, "data": data, "updated_at": time.time()}
+        self._remember((chat_id, user_id), record)
+
+        DialogState.replace(
+            chat_id=chat_id,
+            user_id=user_id,
+            state=state,
+            data=encoded,
+            updated_at=record["updated_at"],
+        ).execute()
+
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % PURGE_EVERY == 0
+        if purge:
+            self.purge_expired()
+
+    def purge_expired(self) -> int:
+        """Удаляет из БД диалоги, неактивные дольше ttl
+
+        :return: количество удаленных диалогов
+        """
+        return DialogState.delete().where(DialogState.updated_at <= time.time() - self.ttl).execute()
+
+    def set_state(self, chat_id, user_id, state):
+        if hasattr(state, "name"):
+            state = state.name
+
+        record = self._load(chat_id, user_id)
+        self._store(chat_id, user_id, state, record["data"] if record else {})
+        return True
+
+    def delete_state(self, chat_id, user_id):
+        with self._lock:
+            self._cache.pop((chat_id, user_id), None)
+
+        deleted = DialogState.delete().where(
+            (DialogState.chat_id == chat_id) & (DialogState.user_id == user_id)
+        ).execute()
+        return bool(deleted)
+
+    def get_state(self, chat_id, user_id):
+        record = self._load(chat_id, user_id)
+        return record["state"] if record else None
+
+    def get_data(self, chat_id, user_id):
+        # в отличие от StateMemoryStorage, для нового пользователя возвращаем пустые данные, чтобы
+        # retrieve_data() можно было вызывать до set_state()
+        record = self._load(chat_id, user_id)
+        return record["data"] if record else {}
+
+    def reset_data(self, chat_id, user_id):
+        record = self._load(chat_id, user_id)
+        if record is None:
+            return False
+
+        self._store(chat_id, user_id, record["state"], {})
+        return True
+
+    def set_data(self, chat_id, user_id, key, value):
+        record = self._load(chat_id, user_id)
+        if record is None:
+            raise RuntimeError("chat_id {} and user_id {} does not exist".format(chat_id, user_id))
+
+        self._store(chat_id, user_id, record["state"], {**record["data"], key: value})
+        return True
+
+    def get_interactive_data(self, chat_id, user_id):
+        return StateContext(self, chat_id, user_id)
+
+    def save(self, chat_id, user_id, data):
+        record = self._load(chat_id, user_id)
+        self._store(chat_id, user_id, record["state"] if record else None, data)
+
+
+class AsyncSQLiteStateStorage(asyncio_storage.StateStorageBase):
+    """То же хранилище для AsyncTeleBot: запросы к SQLite выполняются в пуле потоков и не блокируют цикл событий"""
+
+    def __init__(self, ttl: int, cache_size: int, max_bytes: int) -> None:
+        super().__init__()
+        self.storage = SQLiteStateStorage(ttl=ttl, cache_size=cache_size, max_bytes=max_bytes)
+
+    async def set_state(self, chat_id, user_id, state):
+        return await asyncio.to_thread(self.storage.set_state, chat_id, user_id, state)
+
+    async def delete_state(self, chat_id, user_id):
+        return await asyncio.to_thread(self.storage.delete_state, chat_id, user_id)
+
+    async def get_state(self, chat_id, user_id):
+        return await asyncio.to_thread(self.storage.get_state, chat_id, user_id)
+
+    async def get_data(self, chat_id, user_id):
+        return await asyncio.to_thread(self.storage.get_data, chat_id, user_id)
+
+    async def reset_data(self, chat_id, user_id):
+        return await asyncio.to_thread(self.storage.reset_data, chat_id, user_id)
+
+    async def set_data(self, chat_id, user_id, key, value):
+        return await asyncio.to_thread(self.storage.set_data, chat_id, user_id, key, value)
+
+    def get_interactive_data(self, chat_id, user_id):
+        return asyncio_storage.StateContext(self, chat_id, user_id)
+
+    async def save(self, chat_id, user_id, data):
+        return await asyncio.to_thread(self.storage.save, chat_id, user_id, data)
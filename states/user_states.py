@@ -1,3 +1,4 @@
+from telebot import asyncio_handler_backends
 from telebot.handler_backends import State, StatesGroup
 
 
@@ -16,3 +17,13 @@ class UserStates(StatesGroup):
     input_date = State()
     input_transport_type = State()
     viewing_result = State()
+
+
+class AsyncUserStates(asyncio_handler_backends.StatesGroup):
+    """Те же состояния пользователя для асинхронного бота (AsyncTeleBot проверяет состояния своего типа)"""
+
+    input_departure_station = asyncio_handler_backends.State()
+    input_arrival_station = asyncio_handler_backends.State()
+    input_date = asyncio_handler_backends.State()
+    input_transport_type = asyncio_handler_backends.State()
+    viewing_result = asyncio_handler_backends.State()
@@ -0,0 +1,15 @@
+import pytest
+
+from config_data.config import DB_PATH
+from database.database import create_tables, db
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Временная БД со всеми таблицами вместо database.db"""
+    db.close()
+    db.init(str(tmp_path / "database.db"))
+    create_tables()
+    yield db
+    db.close()
+    db.init(DB_PATH)
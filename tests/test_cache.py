@@ -0,0 +1,130 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from api.cache import AsyncSingleFlight, ResponseCache, SingleFlight
+
+
+def test_async_single_flight_survives_leader_cancellation():
+    """Отмена первого вызывающего не отменяет общий запрос для остальных"""
+
+    async def scenario():
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def request():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        leader = asyncio.create_task(flight.do("key", request))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.do("key", request))
+        await asyncio.sleep(0.01)
+
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+        assert await waiter == "result"
+        assert len(calls) == 1
+        assert flight.stats() == {"calls": 1, "shared": 1, "in_flight": 0}
+
+    asyncio.run(scenario())
+
+
+def test_async_single_flight_cancels_request_without_waiters():
+    """Запрос, результат которого больше никто не ждет, отменяется"""
+
+    async def scenario():
+        flight = AsyncSingleFlight()
+        finished = []
+
+        async def request():
+            await asyncio.sleep(0.05)
+            finished.append(1)
+
+        leader = asyncio.create_task(flight.do("key", request))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+        await asyncio.sleep(0.1)
+        assert not finished
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_response_cache_expires_entries(monkeypatch):
+    cache = ResponseCache(max_bytes=1000)
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+
+    cache.set("key", {"a": 1}, ttl=10)
+    assert cache.get("key") == {"a": 1}
+
+    now[0] += 10
+    assert cache.get("key") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 0, "bytes": 0}
+
+
+def test_response_cache_evicts_least_recently_used_by_size():
+    cache = ResponseCache(max_bytes=30)
+    cache.set("a", "x", ttl=60, text="a" * 10)
+    cache.set("b", "y", ttl=60, text="b" * 10)
+    cache.set("c", "z", ttl=60, text="c" * 10)
+    assert cache.get("a") == "x"  # "a" становится недавно использованным
+
+    cache.set("d", "w", ttl=60, text="d" * 10)
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in "acd"] == ["x", "z", "w"]
+    assert cache.stats()["bytes"] == 30
+
+    # ответ больше всего кэша не сохраняется и не вытесняет остальные
+    cache.set("e", "v", ttl=60, text="e" * 31)
+    assert cache.get("e") is None
+    assert cache.stats()["entries"] == 3
+
+
+def test_single_flight_runs_concurrent_calls_once():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def request():
+        calls.append(1)
+        started.set()
+        release.wait(1)
+        return "result"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", request))) for _ in range(5)]
+    threads[0].start()
+    assert started.wait(1)
+    for thread in threads[1:]:
+        thread.start()
+    while flight.stats()["shared"] < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"calls": 1, "shared": 4, "in_flight": 0}
+
+
+def test_single_flight_shares_exception_and_forgets_call():
+    flight = SingleFlight()
+
+    def failing():
+        raise ValueError("API недоступен")
+
+    with pytest.raises(ValueError):
+        flight.do("key", failing)
+    assert flight.do("key", lambda: "retry") == "retry"
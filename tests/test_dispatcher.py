@@ -0,0 +1,85 @@
+import json
+import threading
+import time
+from collections import Counter
+
+from telebot import apihelper
+
+from utils.dispatcher import OrderedTeleBot
+
+UPDATES = 20
+
+
+class FakeResponse:
+    status_code = 200
+    reason = "OK"
+
+    def __init__(self, result) -> None:
+        self.text = json.dumps({"ok": True, "result": result})
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def make_update(update_id: int) -> dict:
+    chat_id = update_id % 3  # несколько обновлений подряд из одного чата
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "U"},
+            "text": str(update_id),
+        },
+    }
+
+
+def test_polling_handles_each_update_once(monkeypatch):
+    """getUpdates отдает обновления, начиная с offset, как Telegram: пока обработчики заняты, polling
+    не должен получать уже полученные обновления повторно"""
+    pending = [make_update(update_id) for update_id in range(1, UPDATES + 1)]
+    polls = Counter()
+
+    def send_request(method, url, params=None, **kwargs):
+        name = url.rsplit("/", 1)[1]
+        if name == "getMe":
+            return FakeResponse({"id": 1, "is_bot": True, "first_name": "Bot", "username": "bot"})
+        if name != "getUpdates":
+            return FakeResponse(True)
+
+        polls["getUpdates"] += 1
+        offset = int((params or {}).get("offset") or 0)
+        updates = [update for update in pending if update["update_id"] >= offset][:5]
+        if not updates:
+            time.sleep(0.01)  # long polling без новых обновлений
+        return FakeResponse(updates)
+
+    monkeypatch.setattr(apihelper, "CUSTOM_REQUEST_SENDER", send_request)
+
+    bot = OrderedTeleBot("123:test", workers=4, queue_size=100)
+    handled = Counter()
+    lock = threading.Lock()
+    done = threading.Event()
+
+    @bot.message_handler(func=lambda message: True)
+    def handle(message):
+        time.sleep(0.05)  # обработка медленнее, чем получение следующей порции обновлений
+        with lock:
+            handled[message.message_id] += 1
+            if sum(handled.values()) >= UPDATES:
+                done.set()
+
+    bot.dispatcher.start()
+    polling = threading.Thread(target=bot.polling, kwargs={"interval": 0, "timeout": 1}, daemon=True)
+    polling.start()
+    try:
+        assert done.wait(10)
+        time.sleep(0.2)  # повторно полученные обновления успели бы обработаться
+    finally:
+        bot.stop_polling()
+        polling.join(5)
+        bot.dispatcher.stop()
+
+    assert handled == Counter(range(1, UPDATES + 1))
+    assert bot.last_update_id == UPDATES
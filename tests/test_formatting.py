@@ -0,0 +1,78 @@
+import copy
+import json
+from datetime import datetime
+
+from api.core import convert_duration, convert_time, format_page, format_segments, normalize_segments
+from benchmarks.fake_rasp import FakeRaspAPI
+from utils.utils import get_threads
+
+# станции из фикстур: пригородные поезда Москва (Белорусский вокзал) - Одинцово
+FROM_CODE = "s2000006"
+TO_CODE = "s9600721"
+
+
+def make_segments(count: int):
+    return json.loads(FakeRaspAPI().search_body(FROM_CODE, TO_CODE, "2026-05-01", count))["segments"]
+
+
+def test_normalize_segments_prepares_each_column():
+    segments = make_segments(12)
+    table = normalize_segments(segments)
+
+    assert len(table) == 12
+    for index, segment in enumerate(segments):
+        assert table.numbers[index] == segment["thread"]["number"]
+        assert table.routes[index] == f"{segment['from']['title']} - {segment['to']['title']}"
+        assert table.carriers[index] == segment["thread"]["carrier"]["title"]
+        assert table.departures[index] == datetime.fromisoformat(segment["departure"]).timestamp()
+        assert table.arrivals[index] == datetime.fromisoformat(segment["arrival"]).timestamp()
+        assert table.durations[index] == segment["duration"]
+        assert table.times[index] == (
+            f"🕐 {convert_time(segment['departure'])} – {convert_time(segment['arrival'])} "
+            f"({convert_duration(segment['duration'])})"
+        )
+
+
+def test_renderers_accept_segments_and_table_alike():
+    segments = make_segments(12)
+    table = normalize_segments(segments)
+
+    assert format_segments(segments[:3]) == format_segments(normalize_segments(segments[:3]))
+    assert [format_page(segments, page) for page in (1, 2, 3)] == [format_page(table, page) for page in (1, 2, 3)]
+    assert format_page(table, 1).startswith(
+        f"Рейсы 1/3 (найдено 12):\n\n1. Рейс № {segments[0]['thread']['number']} {table.routes[0]}\n{table.times[0]}\n"
+    )
+
+
+def test_take_reorders_rows():
+    table = normalize_segments(make_segments(6))
+    order = sorted(range(len(table)), key=table.durations.__getitem__, reverse=True)
+    taken = table.take(order)
+
+    assert list(taken.durations) == sorted(table.durations, reverse=True)
+    assert taken.numbers == [table.numbers[index] for index in order]
+
+
+def test_get_threads_dedupes_by_uid_in_first_seen_order():
+    segments = make_segments(5)
+    # повтор маршрута и другой маршрут с тем же номером
+    repeated = copy.deepcopy(segments[1])
+    same_number = copy.deepcopy(segments[0])
+    same_number["thread"]["uid"] = "6001_другой"
+    same_number["thread"]["title"] = "Одинцово — Москва (Белорусский вокзал)"
+
+    threads = get_threads(segments + [repeated, same_number])
+
+    assert [thread.uid for thread in threads] == [segment["thread"]["uid"] for segment in segments] + ["6001_другой"]
+    assert threads[-1].number == threads[0].number == "6001"
+    assert threads[-1].title == "Одинцово — Москва (Белорусский вокзал)"
+    assert threads[0].carrier == segments[0]["thread"]["carrier"]["title"]
+
+
+def test_get_threads_falls_back_to_number_without_uid():
+    segments = make_segments(2)
+    for segment in segments:
+        del segment["thread"]["uid"]
+    segments.append(copy.deepcopy(segments[0]))
+
+    assert [thread.uid for thread in get_threads(segments)] == [segment["thread"]["number"] for segment in segments[:2]]
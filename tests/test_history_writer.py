@@ -0,0 +1,111 @@
+from database.database import Search
+from database.history_writer import HistoryWriter
+
+
+def make_writer(**kwargs) -> HistoryWriter:
+    options = {
+        "batch_size": 100,
+        "flush_interval": 60,
+        "history_size": 3,
+        "cached_users": 10,
+        "keep": 5,
+        "prune_interval": 60,
+    }
+    return HistoryWriter(**{**options, **kwargs})
+
+
+def add(writer: HistoryWriter, user: int, arrival: str) -> int:
+    return writer.add(
+        user=user,
+        search_type="route_stations",
+        departure_station="Москва",
+        arrival_station=arrival,
+        transport="suburban",
+    )
+
+
+def test_flush_writes_queued_searches_with_assigned_ids(database):
+    writer = make_writer()
+    ids = [add(writer, 1, f"Станция {index}") for index in range(3)]
+    assert ids == [1, 2, 3]
+    assert Search.select().count() == 0
+
+    assert writer.flush() == 3
+    assert [(search.search_id, search.arrival_station) for search in Search.select().order_by(Search.search_id)] == [
+        (1, "Станция 0"),
+        (2, "Станция 1"),
+        (3, "Станция 2"),
+    ]
+    assert writer.flush() == 0
+
+    # номера продолжаются после уже записанных, в том числе у нового экземпляра
+    assert add(make_writer(), 1, "Станция 3") == 4
+
+
+def test_flush_skips_rows_whose_ids_are_taken(database):
+    writer = make_writer()
+    add(writer, 1, "Станция 0")
+    add(writer, 1, "Станция 1")
+    # номер 1 занял другой процесс, работающий с той же БД
+    Search.insert(
+        search_id=1,
+        user=2,
+        search_type="route_stations",
+        departure_station="Москва",
+        arrival_station="Чужая",
+        transport="bus",
+    ).execute()
+
+    assert writer.flush() == 1
+    assert add(writer, 1, "Станция 2") == 3
+    assert writer.flush() == 1
+    assert Search.select().count() == 3
+
+
+def test_recent_includes_unflushed_searches(database):
+    writer = make_writer(history_size=3)
+    for index in range(2):
+        add(writer, 1, f"Станция {index}")
+    writer.flush()
+
+    assert writer.recent(1) == [
+        "2. Маршрут для: suburban Москва - Станция 1",
+        "1. Маршрут для: suburban Москва - Станция 0",
+    ]
+
+    add(writer, 1, "Станция 2")
+    add(writer, 1, "Станция 3")
+    add(writer, 2, "Станция 4")  # запрос другого пользователя
+    assert writer.recent(1) == [
+        "4. Маршрут для: suburban Москва - Станция 3",
+        "3. Маршрут для: suburban Москва - Станция 2",
+        "2. Маршрут для: suburban Москва - Станция 1",
+    ]
+    assert writer.recent(1, limit=1) == ["4. Маршрут для: suburban Москва - Станция 3"]
+
+    # кольцо нового экземпляра загружается из БД вместе с еще не записанными запросами
+    writer.flush()
+    restarted = make_writer(history_size=3)
+    add(restarted, 1, "Станция 5")
+    assert restarted.recent(1) == [
+        "6. Маршрут для: suburban Москва - Станция 5",
+        "4. Маршрут для: suburban Москва - Станция 3",
+        "3. Маршрут для: suburban Москва - Станция 2",
+    ]
+
+
+def test_prune_keeps_latest_searches_of_each_user(database):
+    writer = make_writer(keep=2, history_size=1)
+    for index in range(4):
+        add(writer, 1, f"Станция {index}")
+        add(writer, 2, f"Станция {index}")
+    writer.flush()
+
+    assert writer.prune() == 4
+    remaining = Search.select(Search.user, Search.arrival_station).order_by(Search.search_id).tuples()
+    assert list(remaining) == [
+        (1, "Станция 2"),
+        (2, "Станция 2"),
+        (1, "Станция 3"),
+        (2, "Станция 3"),
+    ]
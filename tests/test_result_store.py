@@ -0,0 +1,52 @@
+import time
+
+from database.database import SearchResult
+from database.result_store import ResultStore, result_id
+
+
+def test_result_id_depends_on_pages():
+    assert result_id("search", ["1", "2"]) == result_id("search", ["1", "2"])
+    assert result_id("search", ["1", "2"]) != result_id("search", ["1", "3"])
+    assert result_id("search", ["12"]) != result_id("search", ["1", "2"])
+    assert result_id("search", ["1"]) != result_id("other", ["1"])
+
+
+def test_new_result_of_same_search_does_not_replace_old_pages():
+    store = ResultStore(ttl=60, max_entries=10)
+    old = store.put("search", ["старая 1", "старая 2"])
+    new = store.put("search", ["новая 1", "новая 2"])
+
+    assert old != new
+    assert store.get(old) == ["старая 1", "старая 2"]
+    assert store.get(new) == ["новая 1", "новая 2"]
+
+
+def test_results_expire_and_are_evicted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    store = ResultStore(ttl=60, max_entries=2)
+
+    first = store.put("first", ["1"])
+    now[0] += 30
+    second = store.put("second", ["2"])
+    third = store.put("third", ["3"])
+    assert store.get(first) is None  # вытеснен
+    assert store.get(second) == ["2"]
+
+    now[0] += 59
+    assert store.get(second) == ["2"]
+    now[0] += 1
+    assert store.get(second) is None
+    assert store.get(third) is None
+
+
+def test_persistent_results_survive_restart(database, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    rid = ResultStore(ttl=60, max_entries=10, persistent=True).put("search", ["1", "2"])
+
+    assert ResultStore(ttl=60, max_entries=10, persistent=True).get(rid) == ["1", "2"]
+    assert SearchResult.select().count() == 1
+
+    now[0] += 60
+    assert ResultStore(ttl=60, max_entries=10, persistent=True).get(rid) is None
@@ -0,0 +1,112 @@
+import threading
+import time
+
+from telebot.apihelper import ApiTelegramException
+
+from utils.sender import RateLimitedSender
+
+
+class FakeBot:
+    """Заглушка TeleBot: запоминает вызовы и отвечает 429 на первую отправку текстов из limited"""
+
+    def __init__(self, limited=(), retry_after: float = 0.1) -> None:
+        self.limited = set(limited)
+        self.retry_after = retry_after
+        self.calls = []
+        self.lock = threading.Lock()
+        self.released = threading.Event()  # отправки ждут, пока тест не поставит в очередь все сообщения
+        self.released.set()
+        self.called = threading.Event()
+
+    def _call(self, method: str, chat_id, text: str, **kwargs):
+        self.called.set()
+        self.released.wait(5)
+        with self.lock:
+            self.calls.append((method, chat_id, text, time.monotonic()))
+            if text in self.limited:
+                self.limited.discard(text)
+                raise ApiTelegramException(
+                    method,
+                    None,
+                    {
+                        "ok": False,
+                        "error_code": 429,
+                        "description": "Too Many Requests",
+                        "parameters": {"retry_after": self.retry_after},
+                    },
+                )
+        return text
+
+    def send_message(self, chat_id, text, **kwargs):
+        return self._call("send_message", chat_id, text, **kwargs)
+
+    def edit_message_text(self, text, chat_id=None, **kwargs):
+        return self._call("edit_message_text", chat_id, text, **kwargs)
+
+
+def make_sender(bot: FakeBot, **kwargs) -> RateLimitedSender:
+    options = {"global_rate": 1000, "chat_rate": 1000, "chat_burst": 1000, "workers": 4, "max_retries": 3}
+    return RateLimitedSender(bot, **{**options, **kwargs})
+
+
+def test_messages_of_each_chat_are_sent_in_order():
+    bot = FakeBot()
+    sender = make_sender(bot).start()
+    futures = [sender.send_message(chat_id, f"{chat_id}-{index}") for index in range(20) for chat_id in range(3)]
+    assert [future.result(5) for future in futures] == [f"{c}-{i}" for i in range(20) for c in range(3)]
+    sender.stop()
+
+    for chat_id in range(3):
+        texts = [text for _, chat, text, _ in bot.calls if chat == chat_id]
+        assert texts == [f"{chat_id}-{index}" for index in range(20)]
+
+
+def test_edits_are_sent_before_new_messages():
+    bot = FakeBot()
+    bot.released.clear()
+    sender = make_sender(bot, workers=1).start()
+    futures = [sender.send_message(0, "новое 0")]
+    assert bot.called.wait(5)
+    # пока отправляется первое сообщение, в очереди копятся новые сообщения и правки других чатов
+    futures += [sender.send_message(chat_id, f"новое {chat_id}") for chat_id in range(1, 5)]
+    futures += [sender.edit_message_text(f"правка {chat_id}", chat_id) for chat_id in range(5, 10)]
+    bot.released.set()
+    for future in futures:
+        future.result(5)
+    sender.stop()
+
+    methods = [method for method, _, _, _ in bot.calls]
+    assert methods == ["send_message"] + ["edit_message_text"] * 5 + ["send_message"] * 4
+
+
+def test_429_pauses_chat_and_retries_message():
+    bot = FakeBot(limited={"1-0"}, retry_after=0.2)
+    sender = make_sender(bot).start()
+    futures = [sender.send_message(1, f"1-{index}") for index in range(3)]
+    assert [future.result(5) for future in futures] == ["1-0", "1-1", "1-2"]
+    sender.stop()
+
+    texts = [text for _, _, text, _ in bot.calls]
+    assert texts == ["1-0", "1-0", "1-1", "1-2"]
+    assert bot.calls[1][3] - bot.calls[0][3] >= 0.2
+    assert sender.metrics()["retried"] == 1
+    assert sender.metrics()["sent"] == 3
+
+
+def test_429_is_not_retried_forever():
+    bot = FakeBot(limited={"1-0"}, retry_after=0.01)
+    sender = make_sender(bot, max_retries=0).start()
+    future = sender.send_message(1, "1-0")
+    assert isinstance(future.exception(5), ApiTelegramException)
+    sender.stop()
+    assert sender.metrics()["failed"] == 1
+
+
+def test_messages_queued_before_stop_are_sent():
+    bot = FakeBot()
+    sender = make_sender(bot, chat_rate=50, chat_burst=1).start()
+    futures = [sender.send_message(1, str(index)) for index in range(5)]
+    sender.stop()
+
+    assert all(future.done() for future in futures)
+    assert [text for _, _, text, _ in bot.calls] == [str(index) for index in range(5)]
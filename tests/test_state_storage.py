@@ -0,0 +1,61 @@
+import time
+
+from database.database import DialogState
+from states.storage import SQLiteStateStorage
+
+
+def make_storage(**kwargs) -> SQLiteStateStorage:
+    return SQLiteStateStorage(**{"ttl": 60, "cache_size": 10, "max_bytes": 1000, **kwargs})
+
+
+def test_state_and_data_survive_restart(database):
+    storage = make_storage()
+    storage.set_state(1, 2, "UserStates:input_date")
+    storage.set_data(1, 2, "departure_station", "Москва")
+    with storage.get_interactive_data(1, 2) as data:
+        data["arrival_station"] = "Одинцово"
+
+    restarted = make_storage()
+    assert restarted.get_state(1, 2) == "UserStates:input_date"
+    assert restarted.get_data(1, 2) == {"departure_station": "Москва", "arrival_station": "Одинцово"}
+
+    assert restarted.delete_state(1, 2)
+    assert make_storage().get_state(1, 2) is None
+
+
+def test_idle_dialogs_expire(database, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    storage = make_storage(ttl=60)
+    storage.set_state(1, 1, "UserStates:input_date")
+    storage.set_state(2, 2, "UserStates:input_date")
+
+    now[0] += 30
+    storage.set_state(2, 2, "UserStates:viewing_result")  # второй диалог активен
+    now[0] += 31
+    assert storage.get_state(1, 1) is None
+    assert make_storage(ttl=60).get_state(1, 1) is None
+    assert storage.get_state(2, 2) == "UserStates:viewing_result"
+
+    assert storage.purge_expired() == 1
+    assert DialogState.select().count() == 1
+
+
+def test_oversized_data_is_trimmed_everywhere(database):
+    storage = make_storage(max_bytes=200)
+    storage.set_state(1, 1, "UserStates:viewing_result")
+    storage.save(1, 1, {"search_type": "route_stations", "thread_uids": ["uid" * 10] * 20})
+
+    expected = {"search_type": "route_stations"}
+    assert storage.get_data(1, 1) == expected
+    assert make_storage(max_bytes=200).get_data(1, 1) == expected
+    assert storage.get_state(1, 1) == "UserStates:viewing_result"
+
+
+def test_cache_keeps_recent_dialogs_only(database):
+    storage = make_storage(cache_size=2)
+    for chat_id in range(3):
+        storage.set_state(chat_id, chat_id, "UserStates:input_date")
+
+    assert list(storage._cache) == [(1, 1), (2, 2)]
+    assert storage.get_state(0, 0) == "UserStates:input_date"  # вытесненный диалог читается из БД
@@ -0,0 +1,75 @@
+import random
+import threading
+import time
+from collections import Counter
+
+import database.station_search as station_search_module
+from database.database import Station
+from database.station_index import station_index
+from database.station_search import SHORTLIST_FROM, StationSearch, most_common
+
+
+def test_most_common_matches_counter():
+    rng = random.Random(1)
+    for _ in range(200):
+        common = Counter({rng.randrange(1000): rng.randint(1, 4) for _ in range(rng.randint(0, 300))})
+        expected = [key for key, _ in common.most_common(50)]
+        assert sorted(most_common(common, 50)) == sorted(expected)
+
+
+def test_search_finds_title_with_typo():
+    titles = [f"Станция {word}" for word in ("Березовая", "Лесная", "Озерная", "Полевая", "Речная")]
+    search = StationSearch(titles + [f"Платформа {index} км" for index in range(1000)])
+
+    assert search.search("станция берзовая", 3)[0] == "Станция Березовая"
+    assert search.search("Станция Лесная")[0] == "Станция Лесная"
+    assert search.search("щщщщщ") == []
+
+
+def test_search_offers_shortest_titles_for_frequent_prefix():
+    # кратчайшие названия стоят в конце диапазона префикса "ст"
+    titles = [f"Станция {index:04}" for index in range(SHORTLIST_FROM * 3)] + ["Стрела", "Стан"]
+    search = StationSearch(titles)
+
+    assert search.search("ст", 2) == ["Стан", "Стрела"]
+    assert search.search("ста", 1) == ["Стан"]
+    assert search.search("станция 01", 1) == ["Станция 0100"]
+
+
+def test_search_uses_table_until_index_is_built(database, monkeypatch):
+    Station.insert_many(
+        [{"title": title, "code": title, "transport_type": "train"} for title in ("Озерная", "Станция Озерная")]
+    ).execute()
+    search = station_search_module._IndexedStationSearch()
+    monkeypatch.setattr(search, "_build_lock", threading.Lock())
+    monkeypatch.setattr(station_index, "_titles", {})
+    search._build_lock.acquire()  # индекс строится при запуске бота
+
+    assert search.search("озерная") == ["Озерная", "Станция Озерная"]
+    assert search.search("100%") == []
+
+
+def test_search_does_not_wait_for_rebuild(monkeypatch):
+    search = station_search_module._IndexedStationSearch()
+    monkeypatch.setattr(station_index, "_titles", {"Станция Березовая": {}})
+    search.build()
+
+    # справочник обновился, а новый индекс строится долго
+    building = threading.Event()
+    make_index = StationSearch._make_index
+
+    def slow_make_index(titles):
+        building.set()
+        time.sleep(0.5)
+        return make_index(titles)
+
+    monkeypatch.setattr(search, "_make_index", slow_make_index)
+    monkeypatch.setattr(station_index, "_titles", {"Станция Лесная": {}})
+
+    started = time.perf_counter()
+    assert search.search("Станция Березовая") == ["Станция Березовая"]
+    assert time.perf_counter() - started < 0.1
+    assert building.wait(1)
+
+    search.build()  # дожидается фоновой перестройки
+    assert search.search("Станция Лесная") == ["Станция Лесная"]
@@ -0,0 +1,87 @@
+import hashlib
+import json
+
+import pytest
+
+import api.core as core
+from benchmarks.fake_rasp import FakeRaspAPI, iter_stations, start_server
+from database.database import Station
+from database.station_index import station_index
+from database.station_search import station_search
+
+
+@pytest.fixture
+def rasp(database, tmp_path, monkeypatch):
+    """Локальная замена API Яндекс Расписаний. Снимок справочника сохраняется во временный каталог"""
+    monkeypatch.chdir(tmp_path)
+    # индексы станций перестраиваются при обновлении справочника: после теста возвращаем прежние
+    monkeypatch.setattr(station_index, "_titles", None)
+    monkeypatch.setattr(station_search, "_index", station_search._index)
+    monkeypatch.setattr(station_search, "_source", None)
+
+    server, base_url = start_server(FakeRaspAPI(stations=45))
+    monkeypatch.setattr(core, "base_url", base_url)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def serve(server, api: FakeRaspAPI) -> None:
+    """Подменяет справочник, который отдает сервер (вместе с ETag)"""
+    api.stations_body = json.dumps(api.directory, ensure_ascii=False).encode()
+    api.stations_etag = '"%s"' % hashlib.sha256(api.stations_body).hexdigest()[:32]
+    server.RequestHandlerClass.api = api
+
+
+def table():
+    query = Station.select(Station.code, Station.title, Station.transport_type).tuples()
+    return {code: (title, transport_type) for code, title, transport_type in query}
+
+
+def test_refresh_loads_directory_and_skips_unchanged(rasp):
+    api = rasp.RequestHandlerClass.api
+    # станции без названия или кода пропускаются, из повторов кода остается последняя
+    rows = [core.station_row(station) for station in iter_stations(api.directory)]
+    expected = {row["code"]: (row["title"], row["transport_type"]) for row in rows if row}
+
+    changes = core.refresh_stations()
+    assert changes == {"inserted": len(expected), "updated": 0, "deleted": 0}
+    assert table() == expected
+    assert "Станция 44" in station_index
+    assert station_search.search("Станция 44", 1) == ["Станция 44"]
+
+    # тот же справочник: ответ 304 по ETag
+    assert core.refresh_stations() == {"inserted": 0, "updated": 0, "deleted": 0}
+    assert api.requests["stations_list"] == 2
+
+
+def test_refresh_applies_only_changes(rasp):
+    core.refresh_stations()
+
+    api = FakeRaspAPI(stations=40)
+    renamed = next(station for station in iter_stations(api.directory) if station["title"] == "Станция 0")
+    renamed["title"] = "Станция Новая"
+    serve(rasp, api)
+
+    assert core.refresh_stations() == {"inserted": 0, "updated": 1, "deleted": 5}
+    stations = table()
+    assert stations[renamed["codes"]["yandex_code"]][0] == "Станция Новая"
+    assert "Станция 44" not in station_index
+    assert "Станция Новая" in station_index
+
+
+def test_refresh_rejects_mass_deletion_and_truncated_directory(rasp):
+    core.refresh_stations()
+    before = table()
+
+    # справочник без синтетических станций удаляет больше STATIONS_MAX_DELETE_SHARE станций
+    serve(rasp, FakeRaspAPI())
+    assert core.refresh_stations() is None
+    assert table() == before
+
+    truncated = FakeRaspAPI(stations=50)
+    serve(rasp, truncated)
+    truncated.stations_body = truncated.stations_body[: len(truncated.stations_body) // 2]
+    with pytest.raises(ValueError):
+        core.refresh_stations()
+    assert table() == before
@@ -0,0 +1,211 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, ContextManager, Deque, Dict, List
+
+from telebot import TeleBot
+from telebot.types import Update
+
+logger = logging.getLogger(__name__)
+
+# сколько последних замеров времени ожидания в очереди хранится для метрик
+WAIT_SAMPLES = 1000
+
+
+def update_chat_id(update: Update) -> int:
+    """Возвращает идентификатор чата, к которому относится обновление (для упорядочивания по чатам)"""
+    for message in (update.message, update.edited_message, update.channel_post, update.edited_channel_post):
+        if message is not None:
+            return message.chat.id
+
+    if update.callback_query is not None:
+        if update.callback_query.message is not None:
+            return update.callback_query.message.chat.id
+        return update.callback_query.from_user.id
+
+    for query in (update.inline_query, update.chosen_inline_result, update.shipping_query, update.pre_checkout_query):
+        if query is not None:
+            return query.from_user.id
+
+    return update.update_id
+
+
+class UpdateDispatcher:
+    """Пул обработчиков обновлений с ограниченной очередью.
+
+    Обновления распределяются по workers очередям-"полосам" по хэшу идентификатора чата, каждую полосу
+    обрабатывает свой поток. Поэтому сообщения одного пользователя обрабатываются строго по порядку
+    (состояния FSM не портятся), а разные пользователи обслуживаются параллельно. Общий объем очередей
+    ограничен queue_size: если полоса переполнена, submit() возвращает False (обратное давление).
+    Если задан thread_context, каждый поток работает внутри thread_context() (например, с открытым
+    на все время работы соединением с БД).
+    """
+
+    def __init__(
+        self,
+        handle: Callable[[Update], None],
+        workers: int,
+        queue_size: int,
+        thread_context: Callable[[], ContextManager] | None = None,
+    ) -> None:
+        self.handle = handle
+        self.workers = workers
+        self.thread_context = thread_context
+
+        lane_size = max(queue_size // workers, 1)
+        self._lanes: List[queue.Queue] = [queue.Queue(maxsize=lane_size) for _ in range(workers)]
+        self._threads: List[threading.Thread] = []
+
+        self._lock = threading.Lock()
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self.submitted = 0
+        self.processed = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def start(self) -> "UpdateDispatcher":
+        for index, lane in enumerate(self._lanes):
+            thread = threading.Thread(target=self._run, args=(lane,), name=f"updates-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Дообрабатывает уже принятые обновления и останавливает потоки"""
+        for lane in self._lanes:
+            lane.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._threads)
+
+    def submit(self, update: Update, timeout: float | None = None) -> bool:
+        """Ставит обновление в очередь его чата
+
+        :param timeout: сколько секунд ждать места в переполненной очереди (None - ждать, сколько потребуется)
+        :return: False, если очередь так и осталась переполненной и обновление не принято
+        """
+        lane = self._lanes[hash(update_chat_id(update)) % self.workers]
+        try:
+            lane.put((time.perf_counter(), update), timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def _run(self, lane: queue.Queue) -> None:
+        if self.thread_context is None:
+            self._work(lane)
+            return
+
+        with self.thread_context():
+            self._work(lane)
+
+    def _work(self, lane: queue.Queue) -> None:
+        while True:
+            item = lane.get()
+            if item is None:
+                return
+
+            queued_at, update = item
+            with self._lock:
+                self._waits.append(time.perf_counter() - queued_at)
+
+            try:
+                self.handle(update)
+            except Exception:
+                logger.exception("Ошибка при обработке обновления %s", update.update_id)
+                with self._lock:
+                    self.failed += 1
+            finally:
+                with self._lock:
+                    self.processed += 1
+
+    def metrics(self) -> Dict[str, float]:
+        """Метрики очереди: глубина (всего и в самой загруженной полосе), счетчики и время ожидания в очереди"""
+        depths = [lane.qsize() for lane in self._lanes]
+        with self._lock:
+            waits = sorted(self._waits)
+            metrics = {
+                "workers": self.workers,
+                "queue_depth": sum(depths),
+                "max_lane_depth": max(depths),
+                "submitted": self.submitted,
+                "processed": self.processed,
+                "rejected": self.rejected,
+                "failed": self.failed,
+            }
+
+        if waits:
+            metrics["wait_avg_ms"] = sum(waits) / len(waits) * 1000
+            metrics["wait_p95_ms"] = waits[min(int(len(waits) * 0.95), len(waits) - 1)] * 1000
+            metrics["wait_max_ms"] = waits[-1] * 1000
+        return metrics
+
+
+class OrderedTeleBot(TeleBot):
+    """TeleBot, который обрабатывает обновления в потоках UpdateDispatcher.
+
+    Получение обновлений (polling или вебхук) только раскладывает их по очередям чатов, поэтому сообщения
+    одного пользователя обрабатываются по порядку, а разных пользователей - параллельно. Собственный
+    пул потоков TeleBot не используется. Пока диспетчер не запущен, обновления обрабатываются сразу
+    в вызывающем потоке.
+
+    Номер последнего полученного обновления (last_update_id, по нему polling запрашивает следующие)
+    сдвигается в потоке получения до постановки обновлений в очереди и никогда не уменьшается, поэтому
+    еще не обработанные обновления не запрашиваются у Telegram повторно.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        workers: int,
+        queue_size: int,
+        thread_context: Callable[[], ContextManager] | None = None,
+        **kwargs,
+    ) -> None:
+        self._last_update_id = 0
+        self._update_id_lock = threading.Lock()
+        super().__init__(token, threaded=False, **kwargs)
+        self.dispatcher = UpdateDispatcher(
+            handle=self.handle_update,
+            workers=workers,
+            queue_size=queue_size,
+            thread_context=thread_context,
+        )
+
+    @property
+    def last_update_id(self) -> int:
+        return self._last_update_id
+
+    @last_update_id.setter
+    def last_update_id(self, update_id: int) -> None:
+        # TeleBot обновляет номер и в потоках диспетчера, при обработке уже полученных обновлений
+        with self._update_id_lock:
+            if update_id > self._last_update_id:
+                self._last_update_id = update_id
+
+    def handle_update(self, update: Update) -> None:
+        """Обрабатывает одно обновление (вызывается в потоке диспетчера)"""
+        super().process_new_updates([update])
+
+    def process_new_updates(self, updates: List[Update]) -> None:
+        if not self.dispatcher.running:
+            super().process_new_updates(updates)
+            return
+
+        if updates:
+            self.last_update_id = max(update.update_id for update in updates)
+
+        # если очередь чата переполнена, получение новых обновлений ждет, пока она освободится
+        for update in updates:
+            self.dispatcher.submit(update)
@@ -0,0 +1,288 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Deque, Dict, List, Tuple
+
+from telebot import TeleBot
+from telebot.apihelper import ApiTelegramException
+
+logger = logging.getLogger(__name__)
+
+# приоритеты отправки (меньше - раньше): правка уже отправленного сообщения (листание страниц результатов)
+# важнее нового сообщения
+PRIORITY_EDIT = 0
+PRIORITY_SEND = 1
+
+# сколько последних замеров времени ожидания в очереди хранится для метрик
+DELAY_SAMPLES = 1000
+
+# как часто (раз в сколько отправок) забываются чаты без сообщений в очереди и с полным запасом токенов
+PURGE_EVERY = 1000
+
+
+class TokenBucket:
+    """Ограничение частоты: не больше rate операций в секунду в среднем и не больше burst подряд"""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Через сколько секунд будет доступен токен (0 - доступен сейчас)"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def pause(self, now: float, seconds: float) -> None:
+        """Запрещает операции на seconds секунд (например, после ответа 429 с retry_after)"""
+        self._refill(now)
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+class _Job:
+    __slots__ = ("priority", "method", "kwargs", "future", "queued_at", "attempts")
+
+    def __init__(self, priority: int, method: str, kwargs: Dict) -> None:
+        self.priority = priority
+        self.method = method
+        self.kwargs = kwargs
+        self.future: Future = Future()
+        self.queued_at = time.monotonic()
+        self.attempts = 0
+
+
+class _Chat:
+    __slots__ = ("jobs", "bucket", "busy")
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.jobs: Deque[_Job] = deque()
+        self.bucket = TokenBucket(rate, burst)
+        self.busy = False  # сообщение этого чата сейчас отправляется или ждет очереди на отправку
+
+
+class RateLimitedSender:
+    """Отправка сообщений бота через очередь с ограничением частоты запросов к Telegram.
+
+    Telegram ограничивает число сообщений в секунду для бота в целом и для каждого чата и при превышении
+    отвечает ошибкой 429. Отправитель ставит сообщения в очередь и отправляет их в workers потоках так,
+    чтобы не превышать global_rate сообщений в секунду всего и chat_rate (до chat_burst подряд) в каждый
+    чат. Сообщения одного чата отправляются строго по порядку, а среди разных чатов сначала отправляются
+    правки сообщений (листание страниц), затем новые сообщения. После ответа 429 чат ставится на паузу
+    на указанное Telegram время retry_after (вместе с общим лимитом бота), и сообщение отправляется повторно
+    (не больше max_retries раз).
+
+    Методы send_message и edit_message_text принимают те же параметры, что и методы TeleBot, и возвращают
+    Future с результатом. Остальные методы передаются боту без изменений. Пока отправитель не запущен
+    (или уже останавливается), сообщения отправляются сразу в вызывающем потоке.
+    """
+
+    def __init__(
+        self,
+        bot: TeleBot,
+        global_rate: float,
+        chat_rate: float,
+        chat_burst: float,
+        workers: int,
+        max_retries: int,
+    ) -> None:
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.workers = workers
+        self.max_retries = max_retries
+
+        # общий лимит Telegram действует на любую секунду, поэтому общие отправки идут равномерно, без всплесков
+        self._global = TokenBucket(global_rate, 1)
+        self._chats: Dict[Any, _Chat] = {}
+        self._ready: List[Tuple[int, int, Any]] = []  # (приоритет, номер, чат) - можно отправлять сейчас
+        self._delayed: List[Tuple[float, int, Any]] = []  # (время, номер, чат) - ждут токена чата
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._threads: List[threading.Thread] = []
+
+        self._delays: Deque[float] = deque(maxlen=DELAY_SAMPLES)
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.bot, name)
+
+    def send_message(self, chat_id, text, **kwargs) -> Future:
+        return self.submit(PRIORITY_SEND, "send_message", chat_id, text=text, **kwargs)
+
+    def edit_message_text(self, text, chat_id=None, **kwargs) -> Future:
+        return self.submit(PRIORITY_EDIT, "edit_message_text", chat_id, text=text, **kwargs)
+
+    def submit(self, priority: int, method: str, chat_id, **kwargs) -> Future:
+        """Ставит вызов метода бота в очередь чата chat_id"""
+        job = _Job(priority, method, {"chat_id": chat_id, **kwargs})
+        with self._cond:
+            chat = self._chats.get(chat_id)
+            # во время остановки сообщение ставится в очередь, только если в очереди чата уже есть сообщения:
+            # поток, который их отправляет, отправит и его. Иначе потоки могут завершиться раньше
+            queued = self.running and (not self._stopping or (chat is not None and chat.busy))
+            if queued:
+                if chat is None:
+                    chat = self._chats[chat_id] = _Chat(self.chat_rate, self.chat_burst)
+                chat.jobs.append(job)
+                if not chat.busy:
+                    self._schedule(chat_id, chat)
+
+        if not queued:
+            job.future.set_result(getattr(self.bot, method)(**job.kwargs))
+        return job.future
+
+    def _schedule(self, chat_id, chat: _Chat) -> None:
+        # вызывается под self._cond: первое сообщение чата попадает в очередь готовых или отложенных
+        chat.busy = True
+        now = time.monotonic()
+        delay = chat.bucket.delay(now)
+        if delay:
+            heapq.heappush(self._delayed, (now + delay, next(self._seq), chat_id))
+        else:
+            heapq.heappush(self._ready, (chat.jobs[0].priority, next(self._seq), chat_id))
+        self._cond.notify()
+
+    def _next_chat(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, _, chat_id = heapq.heappop(self._delayed)
+                    heapq.heappush(self._ready, (self._chats[chat_id].jobs[0].priority, next(self._seq), chat_id))
+
+                if self._ready:
+                    _, _, chat_id = heapq.heappop(self._ready)
+                    chat = self._chats[chat_id]
+                    chat.bucket.take(now)
+                    return chat_id, chat
+
+                # при остановке потоки завершаются, когда в очереди не останется сообщений
+                if self._stopping and not self._delayed:
+                    return None, None
+
+                self._cond.wait(self._delayed[0][0] - now if self._delayed else None)
+
+    def _acquire_global(self) -> None:
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                delay = self._global.delay(now)
+                if not delay:
+                    self._global.take(now)
+                    return
+            time.sleep(delay)
+
+    def _work(self) -> None:
+        while True:
+            chat_id, chat = self._next_chat()
+            if chat is None:
+                return
+
+            self._acquire_global()
+            job = chat.jobs[0]
+            job.attempts += 1
+            started = time.monotonic()
+
+            try:
+                result = getattr(self.bot, job.method)(**job.kwargs)
+            except ApiTelegramException as error:
+                retry_after = (error.result_json.get("parameters") or {}).get("retry_after")
+                if error.error_code == 429 and retry_after and job.attempts <= self.max_retries:
+                    logger.warning("Telegram ограничил отправку в чат %s на %s с", chat_id, retry_after)
+                    with self._cond:
+                        self.retried += 1
+                        # ограничение Telegram действует на весь бот, поэтому паузу соблюдают и остальные чаты
+                        now = time.monotonic()
+                        self._global.pause(now, retry_after)
+                        chat.bucket.pause(now, retry_after)
+                        self._schedule(chat_id, chat)
+                    continue
+                self._finish(chat_id, chat, job, started, error=error)
+            except Exception as error:
+                self._finish(chat_id, chat, job, started, error=error)
+            else:
+                self._finish(chat_id, chat, job, started, result=result)
+
+    def _finish(self, chat_id, chat: _Chat, job: _Job, started: float, result=None, error=None) -> None:
+        with self._cond:
+            chat.jobs.popleft()
+            self._delays.append(started - job.queued_at)
+            if error is None:
+                self.sent += 1
+            else:
+                self.failed += 1
+
+            if chat.jobs:
+                self._schedule(chat_id, chat)
+            else:
+                chat.busy = False
+
+            if (self.sent + self.failed) % PURGE_EVERY == 0:
+                now = time.monotonic()
+                for idle_id in [key for key, idle in self._chats.items() if not idle.busy and idle.bucket.full(now)]:
+                    del self._chats[idle_id]
+
+        if error is None:
+            job.future.set_result(result)
+        else:
+            logger.warning("Не удалось выполнить %s для чата %s: %s", job.method, chat_id, error)
+            job.future.set_exception(error)
+
+    def start(self) -> "RateLimitedSender":
+        self._stopping = False
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"sender-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Отправляет сообщения, уже стоящие в очереди, и останавливает потоки"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._threads)
+
+    def metrics(self) -> Dict[str, float]:
+        """Метрики очереди отправки: число сообщений в очереди, счетчики и время ожидания отправки"""
+        with self._cond:
+            delays = sorted(self._delays)
+            metrics = {
+                "queued": sum(len(chat.jobs) for chat in self._chats.values()),
+                "chats": len(self._chats),
+                "sent": self.sent,
+                "retried": self.retried,
+                "failed": self.failed,
+            }
+
+        if delays:
+            metrics["delay_avg_ms"] = sum(delays) / len(delays) * 1000
+            metrics["delay_p95_ms"] = delays[min(int(len(delays) * 0.95), len(delays) - 1)] * 1000
+            metrics["delay_max_ms"] = delays[-1] * 1000
+        return metrics
@@ -6,3 +6,9 @@ def set_default_commands(bot):
     bot.set_my_commands(
         [BotCommand(*i) for i in DEFAULT_COMMANDS]
     )
+
+
+async def set_default_commands_async(bot):
+    await bot.set_my_commands(
+        [BotCommand(*i) for i in DEFAULT_COMMANDS]
+    )
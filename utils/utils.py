@@ -1,6 +1,6 @@
 import random
 from datetime import datetime
-from typing import List, Dict
+from typing import Dict, List, NamedTuple
 
 # список из 40 познавательных фактов из истории транспорта
 transport_facts = [
@@ -85,40 +85,26 @@ def convert_date(text: str) -> str:
     return f"{year}-{month}-{day}"
 
 
-def get_threads(lst: List[Dict]) -> List[Dict]:
-    """Получает на вход список рейсов и возвращает маршруты в виде списка:
-    [
-    {
-     идентификатор_маршрута:
-                                {
-                                 название_маршрута: строка
-                                 номер_маршрута: строка
-                                 перевозчик: строка
-                                }
-    }
-    ...
-    ]
+class RouteThread(NamedTuple):
+    """Маршрут (нитка) из выдачи API Яндекс Расписаний"""
+
+    number: str  # номер маршрута
+    title: str  # название маршрута
+    carrier: str  # название перевозчика
+    uid: str  # идентификатор маршрута (номер, если в выдаче нет идентификатора)
+
+
+def get_threads(lst: List[Dict]) -> List[RouteThread]:
+    """Получает на вход список рейсов и возвращает маршруты этих рейсов без повторов, в порядке первого
+    появления в списке. Маршруты различаются по идентификатору (uid), поэтому разные маршруты с одинаковым
+    номером не теряются
     """
-    threads = []
-    thread_numbers_list = []
+    threads = {}
 
     for item in lst:
-        thread_number = item.get("thread").get("number")
-        if thread_number not in thread_numbers_list:
-            thread_numbers_list.append(thread_number)
-
-            thread_title = item.get("thread").get("title")
-            thread_carrier = item.get("thread").get("carrier").get("title")
-            thread_uid = item.get("thread").get("uid")
-
-            threads.append(
-                {
-                    thread_number: {
-                        "title": thread_title,
-                        "carrier": thread_carrier,
-                        "uid": thread_uid,
-                    }
-                }
-            )
-
-    return threads
+        thread = item["thread"]
+        key = thread.get("uid") or thread["number"]
+        if key not in threads:
+            threads[key] = RouteThread(thread["number"], thread["title"], thread["carrier"]["title"], key)
+
+    return list(threads.values())
@@ -0,0 +1,123 @@
+import json
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telebot.custom_filters import StateFilter
+from telebot.types import Update
+
+from api.client import api_client
+from api.core import boot_stations, in_flight, refresh_stations_in_background, search_cache
+from config_data.config import (
+    WEBHOOK_HOST,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+)
+from database.database import create_tables
+from database.history_writer import history_writer
+from loader import bot, sender
+import handlers  # noqa
+from utils.dispatcher import UpdateDispatcher
+from utils.set_bot_commands import set_default_commands
+
+logger = logging.getLogger(__name__)
+
+# сколько секунд запрос от Telegram ждет места в переполненной очереди, прежде чем получить 503
+SUBMIT_TIMEOUT = 1.0
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """
+    Принимает обновления от Telegram (POST на WEBHOOK_PATH) и ставит их в очередь диспетчера.
+    GET на /metrics возвращает в JSON метрики очереди обновлений, очереди отправки сообщений
+    и запросов к API (время ответа по методам, кэш ответов search/, объединение одинаковых запросов)
+    """
+
+    dispatcher: UpdateDispatcher
+
+    def do_POST(self) -> None:
+        if self.path != WEBHOOK_PATH:
+            self.send_error(404)
+            return
+
+        if WEBHOOK_SECRET and self.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+            self.send_error(403)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            update = Update.de_json(json.loads(self.rfile.read(length)))
+        except (ValueError, KeyError, TypeError):
+            self.send_error(400)
+            return
+
+        # при переполненной очереди отвечаем 503 - Telegram повторит доставку обновления позже
+        if self.dispatcher.submit(update, timeout=SUBMIT_TIMEOUT):
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        else:
+            self.send_error(503)
+
+    def do_GET(self) -> None:
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+
+        metrics = {
+            **self.dispatcher.metrics(),
+            "sender": sender.metrics(),
+            "api": {
+                "latency": api_client.latency_stats(),
+                "search_cache": search_cache.stats(),
+                "in_flight": in_flight.stats(),
+            },
+        }
+        body = json.dumps(metrics).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(format, *args)
+
+
+# режим вебхука: Telegram сам присылает обновления на локальный HTTP-сервер, а обрабатывают их
+# UPDATE_WORKERS потоков (сообщения одного чата - строго по порядку). Без WEBHOOK_URL вебхук в Telegram
+# не регистрируется, и сервер можно проверить локально, отправляя ему сохраненные обновления POST-запросом
+if __name__ == "__main__":
+    create_tables()  # создаем БД
+    boot_stations()  # при пустой таблице станций заполняем ее из локального снимка
+
+    bot.add_custom_filter(StateFilter(bot))
+
+    history_writer.start()  # история поиска записывается в БД пачками в фоновом потоке
+    sender.start()
+    dispatcher = bot.dispatcher.start()
+    WebhookHandler.dispatcher = dispatcher
+
+    if WEBHOOK_URL:
+        set_default_commands(bot)
+        bot.remove_webhook()
+        # одно соединение: Telegram присылает следующее обновление только после ответа на предыдущее, поэтому
+        # обновления чата попадают в его очередь по порядку (при нескольких соединениях запросы обрабатываются
+        # разными потоками сервера и могут обогнать друг друга)
+        bot.set_webhook(
+            url=WEBHOOK_URL + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET or None,
+            max_connections=1,
+        )
+
+    # строим индекс поиска станций по неточному названию и обновляем станции из API (только изменения)
+    refresh_stations_in_background()
+
+    server = ThreadingHTTPServer((WEBHOOK_HOST, WEBHOOK_PORT), WebhookHandler)
+    try:
+        server.serve_forever()
+    finally:
+        dispatcher.stop()
+        sender.stop()
+        history_writer.stop()  # дописываем историю поиска, оставшуюся в очереди